@@ -0,0 +1,376 @@
+"""
+Autoplay bot for soak testing long games without a window.
+
+The bot explores each floor, fights the monsters it sees, picks up and uses
+items (healing, scrolls, better equipment) through the inventory menus and
+takes the stairs once the floor is explored, all by passing actions to
+GameSession.step like the input handlers would. Running this module plays
+one game and reports turns per second, peak memory, the entities left on
+each floor and any exception:
+
+    python autoplay.py --floors 10 --turns 20000 --seed 1
+"""
+import argparse
+import time
+import traceback
+from collections import deque
+
+import libtcodpy as libtcod
+
+from game_states import GameStates
+from headless import new_session
+from item_functions import heal
+from render_functions import RenderOrder
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak memory is not reported there
+    resource = None
+
+
+NEIGHBOURS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+
+def peak_rss():
+    """Return peak resident memory of the process in KiB (None if unknown)."""
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux (bytes on macOS)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def entity_counts(entities):
+    """Return dict with the number of entities by kind."""
+    counts = {'entities': len(entities), 'monsters': 0, 'items': 0, 'corpses': 0}
+    for entity in entities:
+        if entity.ai:
+            counts['monsters'] += 1
+        elif entity.item:
+            counts['items'] += 1
+        elif entity.render_order == RenderOrder.CORPSE:
+            counts['corpses'] += 1
+    return counts
+
+
+def floor_info(session):
+    """Return dict with the entity counts and the generator of the current floor."""
+    dungeon = session.game_map.dungeon
+    return dict(entity_counts(session.entities), level=session.game_map.dungeon_level, turn=session.turn,
+                generator=type(dungeon).__name__, generation_time=getattr(dungeon, 'generation_time', None))
+
+
+def first_step(session, is_goal):
+    """
+    Return (dx, dy) of the first step on the shortest walk from the player
+    to the nearest cell for which is_goal(index) is true (None if no goal can
+    be reached). Cells with a blocking entity can only be entered as goals
+    (moving into a monster attacks it).
+    """
+    tiles = session.game_map.tiles
+    entities = session.entities
+    width, height = tiles.width, tiles.height
+    blocked = tiles.blocked_mask()
+
+    player = session.player
+    start = tiles.index(player.x, player.y)
+    first = {start: None}
+    queue = deque([start])
+
+    while queue:
+        index = queue.popleft()
+        x, y = index % width, index // width
+        for dx, dy in NEIGHBOURS:
+            new_x, new_y = x + dx, y + dy
+            if not (0 <= new_x < width and 0 <= new_y < height):
+                continue
+            new_index = new_y * width + new_x
+            if new_index in first or blocked[new_index]:
+                continue
+
+            step = first[index] or (dx, dy)
+            if is_goal(new_index):
+                return step
+            if entities.blocking_at(new_x, new_y):
+                continue
+
+            first[new_index] = step
+            queue.append(new_index)
+
+    return None
+
+
+class AutoPlayer:
+    """
+    Agent (see headless) that plays like a cautious player.
+
+    explore_turns limits the turns spent exploring a floor before heading for
+    the stairs, chase_limit the steps a monster is followed out of sight.
+    """
+
+    def __init__(self, explore_turns=800, chase_limit=10):
+        self.explore_turns = explore_turns
+        self.chase_limit = chase_limit
+        self.level_up_choices = deque(['hp', 'str', 'def'])
+
+        self.floor = None
+        # Cells the player has seen on this floor
+        self.seen = None
+        self.floor_turn = 0
+        # Item to use once the inventory menu is open, targeting item that was used
+        self.pending_item = None
+        self.targeted = None
+        self.use_turn = None
+        # Monster being fought, monsters that could not be reached
+        self.chase = None
+        self.chase_steps = 0
+        self.given_up = set()
+
+    def __call__(self, session):
+        if session.game_map.dungeon_level != self.floor:
+            self.start_floor(session)
+        self.look(session)
+
+        game_state = session.game_state
+        if game_state == GameStates.LEVEL_UP:
+            self.level_up_choices.rotate(-1)
+            return {'level_up': self.level_up_choices[0]}, {}
+
+        if game_state == GameStates.SHOW_INVENTORY:
+            item, self.pending_item = self.pending_item, None
+            if item in session.player.inventory.items:
+                return {'inventory_index': session.player.inventory.items.index(item)}, {}
+            return {'exit': True}, {}
+
+        if game_state == GameStates.TARGETING:
+            return self.target(session)
+
+        if game_state != GameStates.PLAYER_TURN:
+            return {'exit': True}, {}
+
+        return self.player_turn(session)
+
+    def start_floor(self, session):
+        tiles = session.game_map.tiles
+        self.floor = session.game_map.dungeon_level
+        self.seen = bytearray(tiles.width * tiles.height)
+        self.floor_turn = session.turn
+        self.chase = None
+        self.given_up = set()
+
+    def look(self, session):
+        """Remember the cells in the player's field of view."""
+        player = session.player
+        tiles = session.game_map.tiles
+        radius = session.constants['fov_radius']
+        for y in range(max(0, player.y - radius), min(tiles.height, player.y + radius + 1)):
+            for x in range(max(0, player.x - radius), min(tiles.width, player.x + radius + 1)):
+                if libtcod.map_is_in_fov(session.fov_map, x, y):
+                    self.seen[tiles.index(x, y)] = 1
+
+    def visible_monsters(self, session):
+        player = session.player
+        monsters = [entity for entity in session.entities.within_radius(player.x, player.y,
+                                                                         session.constants['fov_radius'])
+                    if entity.ai and libtcod.map_is_in_fov(session.fov_map, entity.x, entity.y)]
+        return sorted(monsters, key=player.distance_to)
+
+    def use(self, item, session):
+        self.pending_item = item
+        self.use_turn = session.turn
+        return {'show_inventory': True}, {}
+
+    def player_turn(self, session):
+        player = session.player
+        fighter = player.fighter
+        tiles = session.game_map.tiles
+        monsters = self.visible_monsters(session)
+        items = player.inventory.items
+
+        # === Items ===
+        # One try per turn (using an item can fail without taking a turn,
+        # e.g. no monster in range)
+        if self.use_turn != session.turn:
+            if fighter.hp < fighter.max_hp * 0.4:
+                for item in items:
+                    if item.item.use_function is heal:
+                        return self.use(item, session)
+
+            if monsters and fighter.hp < fighter.max_hp * 0.6:
+                for item in items:
+                    if item.item.use_function not in (None, heal) and (
+                            not item.item.targeting or player.distance_to(monsters[0]) > 3):
+                        # Fireballs would burn the player too, only target monsters further away
+                        return self.use(item, session)
+
+            for item in items:
+                if item.equippable and self.is_upgrade(player, item):
+                    return self.use(item, session)
+
+        # === Fight ===
+        # Keep chasing a monster that went out of sight for a while (instead
+        # of turning back to explore as soon as it is not visible)
+        targets = [monster for monster in monsters
+                   if monster not in self.given_up or player.distance_to(monster) < 2]
+        if targets:
+            self.chase = targets[0]
+            self.chase_steps = 0
+        elif self.chase and self.chase.ai and self.chase_steps < self.chase_limit:
+            self.chase_steps += 1
+        elif self.chase:
+            # Seen across a gap it takes a long way around to reach, leave
+            # it alone unless it comes close
+            if self.chase.ai:
+                self.given_up.add(self.chase)
+            self.chase = None
+
+        if self.chase:
+            target = tiles.index(self.chase.x, self.chase.y)
+            step = first_step(session, target.__eq__)
+            if step:
+                return {'move': step}, {}
+
+        # === Loot ===
+        if len(items) < player.inventory.capacity:
+            if any(entity.item for entity in session.entities.at(player.x, player.y)):
+                return {'pickup': True}, {}
+
+            loot = {tiles.index(entity.x, entity.y) for entity in session.entities
+                    if entity.item and self.seen[tiles.index(entity.x, entity.y)]}
+            step = first_step(session, loot.__contains__)
+            if step:
+                return {'move': step}, {}
+
+        # === Explore, then take the stairs ===
+        if session.turn - self.floor_turn < self.explore_turns:
+            step = first_step(session, lambda index: not self.seen[index])
+            if step:
+                return {'move': step}, {}
+
+        if any(entity.stairs for entity in session.entities.at(player.x, player.y)):
+            return {'take_stairs': True}, {}
+
+        stairs = {tiles.index(entity.x, entity.y) for entity in session.entities if entity.stairs}
+        step = first_step(session, stairs.__contains__)
+        if step:
+            return {'move': step}, {}
+
+        return {'wait': True}, {}
+
+    @staticmethod
+    def is_upgrade(player, item):
+        """Return True if item is better than the equipped item of its slot."""
+        def value(equippable):
+            return equippable.power_bonus + equippable.defense_bonus + equippable.max_hp_bonus / 10
+
+        equipped = player.equipment.equipped
+        if item in equipped:
+            return False
+
+        current = [other for other in equipped if other.equippable.slot == item.equippable.slot]
+        return not current or value(item.equippable) > value(current[0].equippable)
+
+    def target(self, session):
+        """Click the nearest monster, cancel if that did not use the item."""
+        monsters = self.visible_monsters(session)
+        if self.targeted is session.targeting_item or not monsters:
+            self.targeted = None
+            return {}, {'right_click': True}
+
+        self.targeted = session.targeting_item
+        return {}, {'left_click': (monsters[0].x, monsters[0].y)}
+
+
+def play(seed=None, max_turns=10000, max_floors=None, constants=None):
+    """
+    Let the AutoPlayer play a game until max_turns turns are completed,
+    max_floors floors are cleared, the player died or an exception was raised.
+
+    Return report dict (plain values, see print_report).
+    """
+    session = new_session(constants, seed)
+    agent = AutoPlayer()
+
+    report = {
+        'seed': session.game_map.seed,
+        'turns': 0,
+        'steps': 0,
+        'elapsed': 0.0,
+        'step_time': 0.0,
+        'floors': [],
+        'died': False,
+        'killed_by': None,
+        'exception': None,
+    }
+
+    start = time.perf_counter()
+    try:
+        # Actions in menus take no turn, a bot stuck in them is stopped too
+        while session.turn < max_turns and report['steps'] < max_turns * 10 and \
+                session.game_state != GameStates.PLAYER_DEAD:
+            level = session.game_map.dungeon_level
+            action, mouse_action = agent(session)
+            if action.get('take_stairs'):
+                # The entity list is replaced by the one of the next floor
+                floor = floor_info(session)
+
+            began = time.perf_counter()
+            session.step(action, mouse_action)
+            report['step_time'] += time.perf_counter() - began
+            report['steps'] += 1
+
+            if session.game_map.dungeon_level != level:
+                floor['turn'] = session.turn
+                report['floors'].append(floor)
+                if max_floors and len(report['floors']) >= max_floors:
+                    break
+    except Exception:
+        report['exception'] = traceback.format_exc()
+    finally:
+        session.close()
+
+    report['elapsed'] = time.perf_counter() - start
+    report['turns'] = session.turn
+    report['died'] = session.game_state == GameStates.PLAYER_DEAD
+    report['killed_by'] = session.killed_by
+    report['floors'].append(floor_info(session))
+    report['peak_rss'] = peak_rss()
+    return report
+
+
+def print_report(report):
+    """Print report of play."""
+    elapsed = report['elapsed']
+    print('seed {0}: {1} turns ({2} actions) on {3} floors, {4}'.format(
+        report['seed'], report['turns'], report['steps'], len(report['floors']),
+        'killed by {0}'.format(report['killed_by'] or 'own spell') if report['died'] else 'player alive'))
+    print('{0:.2f}s, {1:.1f} turns/s ({2:.1f} turns/s in GameSession.step)'.format(
+        elapsed, report['turns'] / elapsed if elapsed else 0,
+        report['turns'] / report['step_time'] if report['step_time'] else 0))
+    if report['peak_rss'] is not None:
+        print('peak rss {0:.1f} MiB'.format(report['peak_rss'] / 1024))
+
+    print('floor   turn  entities  monsters  items  corpses  generator       ms')
+    for floor in report['floors']:
+        print('{level:5} {turn:6} {entities:9} {monsters:9} {items:6} {corpses:8}  {generator:<13} {0:6.1f}'.format(
+            (floor['generation_time'] or 0) * 1000, **floor))
+
+    if report['exception']:
+        print(report['exception'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=10000)
+    parser.add_argument('--floors', type=int, default=None, help='stop after clearing this many floors')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    report = play(args.seed, args.turns, args.floors)
+    print_report(report)
+    if report['exception']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
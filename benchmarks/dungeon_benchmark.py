@@ -0,0 +1,149 @@
+"""
+Benchmark the dungeon generators.
+
+Runs create_dungeon of every generator for each map size and seed and
+reports wall time, peak memory (tracemalloc, measured in a separate run so
+it does not slow down the timing), tile counts and the number of rooms or
+zones. Results are written to a JSON file; pass a previous file with
+--compare to see the change in time per generator and size. Run from the
+repository root:
+
+    python -m benchmarks.dungeon_benchmark --sizes 60x50 120x100 --seeds 1 2 3
+    python -m benchmarks.dungeon_benchmark --generators Maze --compare before.json
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+
+from loader_functions.initialize_new_game import get_constants
+from map_objects.dungeon_components.tile import TILE_NAMES
+from map_objects.dungeon_generation.bsp_tree import BSPTree
+from map_objects.dungeon_generation.buildings import Buildings
+from map_objects.dungeon_generation.drunkards_walk import DrunkardsWalk
+from map_objects.dungeon_generation.maze import Maze
+from map_objects.dungeon_generation.tunnel import Tunnel
+
+
+DEFAULT_SIZES = ['60x50', '120x100', '250x250', '500x500']
+DEFAULT_SEEDS = [1, 2, 3]
+
+
+def generators(room_min_size, room_max_size):
+    """Map generator names to factories (same parameters as GameMap.dun_gens)."""
+    return {
+        'Tunnel': lambda w, h, rng: Tunnel(w, h, room_min_size, room_max_size, rng=rng),
+        'BSPTree': lambda w, h, rng: BSPTree(w, h, room_min_size, room_max_size, rng=rng),
+        'Buildings': lambda w, h, rng: Buildings(w, h, room_min_size, room_max_size, rng=rng),
+        'DrunkardsWalk': lambda w, h, rng: DrunkardsWalk(w, h, rng=rng),
+        'Maze': lambda w, h, rng: Maze(w, h, room_min_size, 10, rng=rng),
+    }
+
+
+def run_once(factory, width, height, seed, measure_memory):
+    """Generate one dungeon and return its measurements."""
+    if measure_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    dungeon = factory(width, height, random.Random(seed))
+    dungeon.create_dungeon()
+    elapsed = time.perf_counter() - start
+
+    result = {'time': elapsed}
+
+    if measure_memory:
+        result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    types = dungeon.tiles.types
+    result['tiles'] = {name: types.count(tile_id) for tile_id, name in enumerate(TILE_NAMES)}
+    result['rooms'] = len(getattr(dungeon, 'rooms', []))
+    result['zones'] = len(getattr(dungeon, 'zones', []))
+
+    return result
+
+
+def benchmark(names, sizes, seeds, measure_memory=True):
+    constants = get_constants()
+    factories = generators(constants['room_min_size'], constants['room_max_size'])
+
+    results = []
+    for name in names:
+        for size in sizes:
+            width, height = (int(n) for n in size.split('x'))
+            for seed in seeds:
+                result = run_once(factories[name], width, height, seed, measure_memory=False)
+                if measure_memory:
+                    memory = run_once(factories[name], width, height, seed, measure_memory=True)
+                    result['peak_memory'] = memory['peak_memory']
+
+                result.update({'generator': name, 'size': size, 'seed': seed})
+                results.append(result)
+
+                print('{0:<14} {1:>8} seed {2:<4} {3:8.3f}s  {4:>10}  rooms {5:<3} zones {6}'.format(
+                    name, size, seed, result['time'],
+                    '{0:.1f} KiB'.format(result['peak_memory'] / 1024) if measure_memory else '-',
+                    result['rooms'], result['zones']))
+
+    return results
+
+
+def mean_times(results):
+    """Return mean time per (generator, size)."""
+    times = {}
+    for result in results:
+        times.setdefault((result['generator'], result['size']), []).append(result['time'])
+    return {key: sum(values) / len(values) for key, values in times.items()}
+
+
+def compare(results, previous_results):
+    """Print mean time per generator and size compared to previous results."""
+    current = mean_times(results)
+    previous = mean_times(previous_results)
+
+    print('\n{0:<14} {1:>8} {2:>10} {3:>10} {4:>8}'.format('generator', 'size', 'before', 'after', 'speedup'))
+    for key, after in current.items():
+        before = previous.get(key)
+        if before is None:
+            continue
+        print('{0:<14} {1:>8} {2:9.3f}s {3:9.3f}s {4:7.2f}x'.format(key[0], key[1], before, after, before / after))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--generators', nargs='+', default=['Tunnel', 'BSPTree', 'Buildings', 'DrunkardsWalk', 'Maze'])
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, help='map sizes as WIDTHxHEIGHT')
+    parser.add_argument('--seeds', nargs='+', type=int, default=DEFAULT_SEEDS)
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory measurement')
+    parser.add_argument('--output', default='dungeon_benchmark.json')
+    parser.add_argument('--compare', help='JSON file of a previous run')
+    args = parser.parse_args()
+
+    results = benchmark(args.generators, args.sizes, args.seeds, measure_memory=not args.no_memory)
+
+    with open(args.output, 'w') as output_file:
+        json.dump({
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'results': results,
+        }, output_file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as previous_file:
+            compare(results, json.load(previous_file)['results'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Compare frames per second of the map render paths.
+
+    per_cell     original loop (map_is_in_fov + console_put_char_ex for every cell
+                 of the whole map)
+    incremental  MapRenderer (only redraws changed cells of the view)
+    bulk         BulkMapRenderer (console_fill_char/foreground/background of the view)
+
+The player walks randomly through a Tunnel dungeon so the FOV changes
+every frame; the camera follows the player on maps larger than the view.
+Run from the repository root:
+
+    python -m benchmarks.render_benchmark --width 60 --height 50 --frames 500
+    python -m benchmarks.render_benchmark --width 500 --height 500 --skip-per-cell
+"""
+import libtcodpy as libtcod
+
+import argparse
+import random
+import time
+
+from camera import Camera
+from entity import Entity, EntityList
+from fov_functions import initialize_fov, recompute_fov
+from map_objects.dungeon_generation.tunnel import Tunnel
+from map_objects.game_map import GameMap
+from render_functions import BulkMapRenderer, MapRenderer
+
+
+def render_per_cell(con, game_map, fov_map):
+    """Draw every cell of the map (render path before MapRenderer)."""
+    tiles = game_map.tiles
+    for y in range(game_map.height):
+        for x in range(game_map.width):
+            visible = libtcod.map_is_in_fov(fov_map, x, y)
+
+            if visible:
+                tile_fg, tile_bg = tiles.colors(x, y, lit=True)
+                libtcod.console_put_char_ex(con, x, y, tiles.character(x, y),
+                                            libtcod.Color(*tile_fg), libtcod.Color(*tile_bg))
+                tiles.set_explored(x, y)
+
+            elif tiles.is_explored(x, y):
+                tile_fg, tile_bg = tiles.colors(x, y, lit=False)
+                libtcod.console_put_char_ex(con, x, y, tiles.character(x, y),
+                                            libtcod.Color(*tile_fg), libtcod.Color(*tile_bg))
+
+
+def walk(player, game_map):
+    """Move player to a random unblocked neighbouring tile."""
+    steps = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+             if (dx or dy) and not game_map.is_blocked(player.x + dx, player.y + dy)]
+    if steps:
+        player.move(*random.choice(steps))
+
+
+def run(mode, width, height, view_width, view_height, frames, fov_radius, seed):
+    """Render frames and return frames per second."""
+    random.seed(seed)
+
+    player = Entity(0, 0, '@', libtcod.white, 'Player', blocks=True)
+    entities = EntityList([player])
+    game_map = GameMap(width, height, 6, 13)
+    game_map.make_map(Tunnel, player, entities)
+
+    fov_map = initialize_fov(game_map)
+    camera = Camera(view_width, view_height)
+
+    if mode == 'per_cell':
+        con = libtcod.console_new(width, height)
+    else:
+        con = libtcod.console_new(view_width, view_height)
+
+    if mode == 'incremental':
+        map_renderer = MapRenderer(con, fov_radius, camera)
+    elif mode == 'bulk':
+        map_renderer = BulkMapRenderer(con, fov_radius, camera)
+
+    start = time.perf_counter()
+    for frame in range(frames):
+        walk(player, game_map)
+        recompute_fov(fov_map, player.x, player.y, fov_radius)
+
+        if mode == 'per_cell':
+            render_per_cell(con, game_map, fov_map)
+        else:
+            camera.follow(player.x, player.y, width, height)
+            map_renderer.render(game_map, fov_map, True, player.x, player.y)
+    elapsed = time.perf_counter() - start
+
+    libtcod.console_delete(con)
+
+    return frames / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=60)
+    parser.add_argument('--height', type=int, default=50)
+    parser.add_argument('--view-width', type=int, default=60)
+    parser.add_argument('--view-height', type=int, default=50)
+    parser.add_argument('--skip-per-cell', action='store_true', help='leave out the (slow) whole map loop')
+    parser.add_argument('--frames', type=int, default=500)
+    parser.add_argument('--fov-radius', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('{0}x{1} map, {2}x{3} view, {4} frames, FOV radius {5}'.format(
+        args.width, args.height, args.view_width, args.view_height, args.frames, args.fov_radius))
+
+    modes = ('incremental', 'bulk') if args.skip_per_cell else ('per_cell', 'incremental', 'bulk')
+    results = {}
+    for mode in modes:
+        results[mode] = run(mode, args.width, args.height, args.view_width, args.view_height, args.frames,
+                            args.fov_radius, args.seed)
+
+    for mode, fps in results.items():
+        print('{0:<12} {1:10.1f} fps  ({2:.1f}x)'.format(mode, fps, fps / results[modes[0]]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Compare the binary save format with pickling the game through shelve.
+
+A random walker plays a few hundred turns first, so the save holds
+corpses, messages and changed monsters. Reports save time, load time and
+file size of both, and checks that loading the binary save restores the
+same game. Run from the repository root:
+
+    python -m benchmarks.save_benchmark --turns 300 --repeat 20
+"""
+import argparse
+import os
+import random
+import shelve
+import tempfile
+import time
+
+from components.ai import ConfusedMonster, FrozenMonster
+from headless import new_session, random_walker, run
+from loader_functions.save_format import EQUIPMENT_SLOTS, dump, load
+
+
+def color_tuple(color):
+    return (color.r, color.g, color.b) if color is not None else None
+
+
+def snapshot(player, entities, game_map, message_log, game_state):
+    """Return the saved state of a game as comparable values."""
+    def entity_state(entity):
+        ai_chain = []
+        ai = entity.ai
+        while ai is not None:
+            ai_chain.append((type(ai).__name__, getattr(ai, 'number_of_turns', None), getattr(ai, 'awake', None)))
+            ai = getattr(ai, 'previous_ai', None)
+
+        fighter = entity.fighter
+        return (
+            entity.template, entity.x, entity.y, entity.char, color_tuple(entity.color), entity.name,
+            entity.blocks, entity.render_order, entity.description, tuple(ai_chain),
+            (fighter.hp, fighter.max_hp, fighter.power, fighter.defense, fighter.xp, fighter.energy, fighter.rank)
+            if fighter else None,
+            (entity.level.current_level, entity.level.current_xp) if entity.level else None,
+            [item.template for item in entity.inventory.items] if entity.inventory else None,
+            [getattr(getattr(entity.equipment, slot), 'template', None) for slot in EQUIPMENT_SLOTS]
+            if entity.equipment else None,
+            entity.stairs.floor if entity.stairs else None,
+        )
+
+    return {
+        'game_state': game_state,
+        'dungeon_level': game_map.dungeon_level,
+        'seed': game_map.seed,
+        'rng': game_map.rng.getstate(),
+        'types': bytes(game_map.tiles.types),
+        'explored': bytes(game_map.tiles.explored),
+        'messages': [(message.text, color_tuple(message.color)) for message in message_log.messages],
+        'entities': [entity_state(entity) for entity in entities],
+        'player': entities.index(player),
+    }
+
+
+def add_saved_state(session):
+    """
+    Give the game state a save has to keep that a short random walk may not
+    reach: effects on top of each other, awake and dormant monsters,
+    explored cells and a used rng.
+    """
+    monsters = [entity for entity in session.entities if entity.ai]
+    for number, monster in enumerate(monsters):
+        if number % 3 == 0:
+            monster.ai.awake = not monster.ai.awake
+        if number % 4 == 1:
+            monster.ai = FrozenMonster(ConfusedMonster(monster.ai, 7), 3)
+            monster.ai.owner = monster.ai.previous_ai.owner = monster
+
+    tiles = session.game_map.tiles
+    for i in range(0, len(tiles.explored), 7):
+        tiles.explored[i] = 1
+    session.game_map.rng.random()
+
+
+def check_round_trip(game):
+    """Save and load the game, exit naming the first part that changed."""
+    saved = snapshot(*game)
+    loaded = snapshot(*load(dump(*game)))
+    for key, value in saved.items():
+        if loaded[key] != value:
+            raise SystemExit('binary save did not restore the {0}'.format(key))
+
+
+def save_shelve(path, player, entities, game_map, message_log, game_state):
+    """Save the game like the old shelve based save_game."""
+    with shelve.open(path) as data_file:
+        data_file['player_index'] = entities.index(player)
+        data_file['entities'] = entities
+        data_file['game_map'] = game_map
+        data_file['message_log'] = message_log
+        data_file['game_state'] = game_state
+
+
+def load_shelve(path):
+    with shelve.open(path) as data_file:
+        entities = data_file['entities']
+        return (entities[data_file['player_index']], entities, data_file['game_map'],
+                data_file['message_log'], data_file['game_state'])
+
+
+def save_binary(path, *game):
+    with open(path, 'wb') as data_file:
+        data_file.write(dump(*game))
+
+
+def load_binary(path):
+    with open(path, 'rb') as data_file:
+        return load(data_file.read())
+
+
+def file_size(path):
+    """Return size of a save (shelve may split it into several files)."""
+    directory, name = os.path.split(path)
+    return sum(os.path.getsize(os.path.join(directory, file_name))
+               for file_name in os.listdir(directory) if file_name.startswith(name))
+
+
+def measure(save, load_function, path, game, repeat):
+    """Return mean save time, mean load time and file size."""
+    start = time.perf_counter()
+    for i in range(repeat):
+        save(path, *game)
+    save_time = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for i in range(repeat):
+        load_function(path)
+    load_time = (time.perf_counter() - start) / repeat
+
+    return save_time, load_time, file_size(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    session = new_session(seed=args.seed)
+    run(session, random_walker, args.turns)
+    session.close()
+    game = (session.player, session.entities, session.game_map, session.message_log, session.game_state)
+
+    check_round_trip(game)
+    add_saved_state(session)
+    check_round_trip(game)
+    print('round trip ok ({0} turns, {1} entities)'.format(session.turn, len(session.entities)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {
+            'shelve': measure(save_shelve, load_shelve, os.path.join(directory, 'shelve.dat'), game, args.repeat),
+            'binary': measure(save_binary, load_binary, os.path.join(directory, 'binary.dat'), game, args.repeat),
+        }
+
+    for name, (save_time, load_time, size) in results.items():
+        print('{0:<8} save {1:8.2f} ms  load {2:8.2f} ms  {3:8.1f} KiB'.format(
+            name, save_time * 1000, load_time * 1000, size / 1024))
+
+
+if __name__ == '__main__':
+    main()
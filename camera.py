@@ -0,0 +1,38 @@
+class Camera:
+    """
+    Viewport on the game map that follows the player.
+
+    World coordinates are cells of the game map, view coordinates are cells
+    of the map console (and the cursor console), which has the size of the
+    viewport. The map console is drawn at (screen_x, screen_y) of the root
+    console, where mouse positions are given in screen coordinates.
+    """
+    def __init__(self, width, height, screen_x=0, screen_y=0):
+        self.width = width
+        self.height = height
+        self.screen_x = screen_x
+        self.screen_y = screen_y
+        # World coordinates of the top left cell of the view
+        self.x = 0
+        self.y = 0
+
+    def follow(self, target_x, target_y, map_width, map_height):
+        """Center the view on the target without scrolling past the edges of the map."""
+        self.x = max(0, min(target_x - self.width // 2, map_width - self.width))
+        self.y = max(0, min(target_y - self.height // 2, map_height - self.height))
+
+    def in_view(self, x, y):
+        """Return True if the world cell (x, y) is in the view."""
+        return 0 <= x - self.x < self.width and 0 <= y - self.y < self.height
+
+    def to_view(self, x, y):
+        """Return view coordinates of a world cell."""
+        return x - self.x, y - self.y
+
+    def to_world(self, screen_x, screen_y):
+        """Return world coordinates of a root console cell (None if it is not in the view)."""
+        view_x = screen_x - self.screen_x
+        view_y = screen_y - self.screen_y
+        if 0 <= view_x < self.width and 0 <= view_y < self.height:
+            return view_x + self.x, view_y + self.y
+        return None
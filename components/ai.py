@@ -1,12 +1,18 @@
 import libtcodpy as libtcod
 
-from random import randint
-
 from game_messages import Message
 
 
 class BasicMonster:
-    """Defines generic monster behaviour."""
+    """
+    Defines generic monster behaviour.
+
+    Monsters are dormant (take no turns) until they see or hear the player,
+    see GameSession.wake_monsters, and go dormant again out of sight.
+    """
+
+    def __init__(self):
+        self.awake = False
 
     def take_turn(self, target, fov_map, game_map, entities):
         """Movement and attack during monster turn."""
@@ -16,15 +22,28 @@ class BasicMonster:
         if libtcod.map_is_in_fov(fov_map, monster.x, monster.y):
 
             if monster.distance_to(target) >= 2:
-                monster.move_astar(target, entities, game_map)
+                monster.move_downhill(target, entities, game_map)
 
             elif target.fighter.hp > 0:
                 attack_results = monster.fighter.attack(target)
                 results.extend(attack_results)
 
+        else:
+            # A monster out of sight does nothing, so it leaves the turn
+            # order until it is woken again
+            self.awake = False
+            results.append({'dormant': monster})
+
         return results
 
 
+def base_ai(ai):
+    """Return the ai under all effects (confusion, freezing)."""
+    while hasattr(ai, 'previous_ai'):
+        ai = ai.previous_ai
+    return ai
+
+
 class ConfusedMonster:
     """Monster behaviour when confused."""
 
@@ -37,8 +56,8 @@ class ConfusedMonster:
         results = []
 
         if self.number_of_turns > 0:
-            random_x = self.owner.x + randint(0, 2) - 1
-            random_y = self.owner.y + randint(0, 2) - 1
+            random_x = self.owner.x + game_map.rng.randint(0, 2) - 1
+            random_y = self.owner.y + game_map.rng.randint(0, 2) - 1
 
             if random_x != self.owner.x and random_y != self.owner.y:
                 self.owner.move_towards(random_x, random_y, game_map, entities)
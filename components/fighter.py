@@ -6,15 +6,18 @@ from game_messages import Message
 class Fighter:
     """Fighter compomenent for entities."""
 
-    def __init__(self, hp, defense, power, xp=0):
+    def __init__(self, hp, defense, power, xp=0, speed=10):
         self.base_max_hp = hp
         self.hp = hp
         self.base_defense = defense
         self.base_power = power
-        self.base_movement_speed = 1
-        self.movement_mod = None
-        self.turn = 0
         self.xp = xp
+        # Energy gained per tick, actions cost energy (see TurnScheduler)
+        self.speed = speed
+        self.energy = 0
+        # Order among the actors that can act at the same tick, kept while
+        # the monster is dormant and saved with the game (see TurnScheduler)
+        self.rank = None
 
     @property
     def max_hp(self):
@@ -46,12 +49,6 @@ class Fighter:
 
         return self.base_defense + bonus
 
-    @property
-    def movement_speed(self):
-        if self.movement_mod:
-            return self.base_movement_speed + self.movement_mod
-        return self.base_movement_speed
-
     def take_damage(self, amount):
         """Subtract damage from Fighter hp and return 'dead' if hp <= 0."""
         results = []
@@ -1,306 +1,131 @@
 import libtcodpy as libtcod
 
-import os
+import argparse
 
-from death_functions import kill_monster, kill_player
-from entity import get_blocking_entities_at_location
-from fov_functions import initialize_fov, recompute_fov
-from game_messages import Message
+from camera import Camera
+from game_session import GameSession
 from game_states import GameStates
 from input_handlers import handle_keys, handle_mouse, handle_main_menu
+from loader_functions.autosave import Autosave
 from loader_functions.initialize_new_game import get_constants, get_game_variables
-from loader_functions.data_loaders import load_game, save_game
-from menus import main_menu, message_box
-from render_functions import clear_all, render_all
+from loader_functions.data_loaders import load_game
+from loader_functions.recording import Recorder
+from menus import main_menu, message_box, progress_box
+from profiler import FrameProfiler
+from render_functions import BulkMapRenderer, MapRenderer, clear_all, render_all
 
 
-def play_game(player, entities, game_map, message_log, game_state, con, panel, cursor, constants):
-    colors = constants['colors']
-
-    fov_recompute = True
-    fov_map = initialize_fov(game_map)
-
+def build_floor(builder, constants):
+    """
+    Complete a FloorBuilder a slice per frame, drawing its progress in
+    between, so the window stays responsive while a large floor is generated.
+    """
     key = libtcod.Key()
     mouse = libtcod.Mouse()
 
-    game_state = GameStates.PLAYER_TURN
-    previous_game_state = game_state
-
-    # Keep track of targeting item
-    targeting_item = None
-
-    # === MAIN GAME LOOP ===
-    while not libtcod.console_is_window_closed():
+    while not builder.advance(constants['generation_slice'] / 1000):
         libtcod.sys_check_for_event(libtcod.EVENT_KEY_PRESS | libtcod.EVENT_MOUSE, key, mouse)
+        if libtcod.console_is_window_closed():
+            # Nothing to show anymore, the game exits after this floor
+            builder.finish()
+            break
 
-        if fov_recompute:
-            recompute_fov(fov_map, player.x, player.y, constants['fov_radius'],
-                            constants['fov_light_walls'], constants['fov_algorithm'])
-
-        render_all(con, panel, cursor, entities, player, game_map, fov_map, fov_recompute,
-                    message_log, constants['screen_width'], constants['screen_height'],
-                    constants['bar_width'], constants['panel_width'], constants['panel_x'],
-                    mouse, constants['colors'], game_state, targeting_item, key)
-
-        fov_recompute = False
-
+        progress_box('Generating dungeon...', builder.progress, 30, constants['screen_width'],
+                     constants['screen_height'], constants['colors'])
         libtcod.console_flush()
 
-        clear_all(con, entities)
-
-        # === PLAYER TURN ===
-        # Handle player action
-        action = handle_keys(key, game_state)
-        mouse_action = handle_mouse(mouse)
-
-        move = action.get('move')
-        wait = action.get('wait')
-        pickup = action.get('pickup')
-        show_inventory = action.get('show_inventory')
-        show_equipment = action.get('show_equipment')
-        drop_inventory = action.get('drop_inventory')
-        inventory_index = action.get('inventory_index')
-        take_stairs = action.get('take_stairs')
-        level_up = action.get('level_up')
-        show_character_screen = action.get('show_character_screen')
-        exit = action.get('exit')
-        fullscreen = action.get('fullscreen')
-
-        left_click = mouse_action.get('left_click')
-        right_click = mouse_action.get('right_click')
-
-        player_turn_results = []
-
-        # Check what player did this turn
-        if move and game_state == GameStates.PLAYER_TURN:
-            dx, dy = move
-            destination_x = player.x + dx
-            destination_y = player.y + dy
-            # Check if tile is passable
-            if not game_map.is_blocked(destination_x, destination_y):
-                target = get_blocking_entities_at_location(entities, destination_x, destination_y)
-
-                if target:
-                    attack_results = player.fighter.attack(target)
-                    player_turn_results.extend(attack_results)
-                else:
-                    player.take_step(dx, dy, game_map)
-
-                    # Recompute FOV everytime the player moves
-                    fov_recompute = True
-
-                game_state = GameStates.ENEMY_TURN
-
-        elif wait:
-            game_state = GameStates.ENEMY_TURN
-
-        elif pickup and game_state == GameStates.PLAYER_TURN:
-            for entity in entities:
-                if entity.item and entity.x == player.x and entity.y == player.y:
-                    pickup_results = player.inventory.add_item(entity)
-                    player_turn_results.extend(pickup_results)
-
-                    break
-            else:
-                message_log.add_message(Message('There is nothing here to pick up.', colors['text_warning']))
-
-        if show_inventory:
-            previous_game_state = game_state
-            game_state = GameStates.SHOW_INVENTORY
-
-        if show_equipment:
-            previous_game_state = game_state
-            game_state = GameStates.SHOW_EQUIPMENT
-
-        if drop_inventory:
-            previous_game_state = game_state
-            game_state = GameStates.DROP_INVENTORY
-
-        if inventory_index is not None and previous_game_state != GameStates.PLAYER_DEAD \
-                and inventory_index < len(player.inventory.items):
-                item = player.inventory.items[inventory_index]
-
-                if game_state == GameStates.SHOW_INVENTORY:
-                    player_turn_results.extend((player.inventory.use(item, entities=entities, fov_map=fov_map)))
-
-                elif game_state == GameStates.SHOW_EQUIPMENT:
-                        item = player.equipment.equipped[inventory_index]
-                        player_turn_results.extend((player.inventory.use(item, entities=entities, fov_map=fov_map)))
-
-                elif game_state == GameStates.DROP_INVENTORY:
-                    player_turn_results.extend((player.inventory.drop_item(item)))
-
-        if take_stairs and game_state == GameStates.PLAYER_TURN:
-            for entity in entities:
-                if entity.stairs and entity.x == player.x and entity.y == player.y:
-                    entities = game_map.next_floor(player, message_log, constants)
-                    fov_map = initialize_fov(game_map)
-                    libtcod.console_clear(con)
-
-                    break
-            else:
-                message_log.add_message(Message('There are no stairs here.', colors['text_warning']))
-
-        if level_up:
-            if level_up == 'hp':
-                player.fighter.base_max_hp += 20
-                player.fighter.hp += 20
-            elif level_up == 'str':
-                player.fighter.base_power += 1
-            elif level_up == 'def':
-                player.fighter.base_defense += 1
-
-            game_state = previous_game_state
-
-        if show_character_screen:
-            previous_game_state = game_state
-            game_state = GameStates.CHARACTER_SCREEN
-
-        if game_state == GameStates.TARGETING:
-            # if select_target:
-            #     current_x, current_y = player.x, player.y
-            #     dx, dy = select_target
-            #     new_x, new_y = current_x + dx, current_y + dy
-
-            if left_click:
-                target_x, target_y = left_click
-
-                item_use_results = player.inventory.use(targeting_item, entities=entities, fov_map=fov_map,
-                                                        target_x=target_x, target_y=target_y)
-                player_turn_results.extend(item_use_results)
-            elif right_click:
-                player_turn_results.append({'targeting_cancelled': True})
-
-        if exit:
-            if game_state in {GameStates.SHOW_INVENTORY, GameStates.SHOW_EQUIPMENT, GameStates.DROP_INVENTORY, GameStates.CHARACTER_SCREEN}:
-                game_state = previous_game_state
-            elif game_state == GameStates.TARGETING:
-                player_turn_results.append({'targeting_cancelled': True})
-            elif game_state == GameStates.PLAYER_DEAD:
-                # Delete save file if player exits after dying
-                if os.path.isfile('savegame.dat'):
-                    os.remove('savegame.dat')
-                return True
-            else:
-                save_game(player, entities, game_map, message_log, game_state)
-                return True
-
-        if fullscreen:
-            libtcod.console_set_fullscreen(not libtcod.console_is_fullscreen())  # toggle on/off
-
-        # At the end of the player's turn, evaluate results and print messages to log
-        for player_turn_result in player_turn_results:
-            message = player_turn_result.get('message')
-            dead_entity = player_turn_result.get('dead')
-            item_added = player_turn_result.get('item_added')
-            item_consumed = player_turn_result.get('consumed')
-            item_dropped = player_turn_result.get('item_dropped')
-            equip = player_turn_result.get('equip')
-            targeting = player_turn_result.get('targeting')
-            targeting_cancelled = player_turn_result.get('targeting_cancelled')
-            xp = player_turn_result.get('xp')
-
-            if message:
-                message_log.add_message(message)
-
-            if targeting_cancelled:
-                game_state = previous_game_state
-
-                message_log.add_message(Message('Targeting cancelled'))
-
-            if dead_entity:
-                if dead_entity == player:
-                    message, game_state = kill_player(dead_entity)
-                else:
-                    message = kill_monster(dead_entity)
 
-                message_log.add_message(message)
-
-            if item_added:
-                # Remove item from map (now in inventory)
-                entities.remove(item_added)
-                # Takes a turn
-                game_state = GameStates.ENEMY_TURN
-
-            if item_consumed:
-                game_state = GameStates.ENEMY_TURN
-
-            if equip:
-                equip_results = player.equipment.toggle_equip(equip)
+def play_game(player, entities, game_map, message_log, game_state, con, panel, cursor, constants, profiler,
+              resume=False, record_path=None):
+    """
+    Run a game (resume: the game was loaded, replay the actions journaled since).
 
-                for equip_result in equip_results:
-                    equipped = equip_result.get('equipped')
-                    dequipped = equip_result.get('dequipped')
+    The game is recorded to record_path for replay.py if it is given.
+    """
+    session = GameSession(player, entities, game_map, message_log, game_state, constants, profiler,
+                          lambda builder: build_floor(builder, constants))
 
-                    if equipped:
-                        message_log.add_message(Message('You equipped the {0}'.format(equipped.name), colors['text_equip']))
+    autosave = Autosave(constants['checkpoint_interval'])
+    if resume:
+        autosave.replay(session)
+    autosave.checkpoint(session)
 
-                    if dequipped:
-                        message_log.add_message(Message('You dequipped the {0}'.format(dequipped.name), colors['text_unequip']))
+    recorder = Recorder(record_path, session) if record_path else None
 
-                game_state = GameStates.ENEMY_TURN
+    camera = Camera(constants['viewport_width'], constants['viewport_height'], constants['viewport_x'])
 
-            if targeting:
-                previous_game_state = GameStates.PLAYER_TURN
-                game_state = GameStates.TARGETING
+    if constants['bulk_render']:
+        map_renderer = BulkMapRenderer(con, constants['fov_radius'], camera)
+    else:
+        map_renderer = MapRenderer(con, constants['fov_radius'], camera)
 
-                targeting_item = targeting
+    key = libtcod.Key()
+    mouse = libtcod.Mouse()
 
-                message_log.add_message(targeting_item.item.targeting_message)
+    # === MAIN GAME LOOP ===
+    while not libtcod.console_is_window_closed():
+        libtcod.sys_check_for_event(libtcod.EVENT_KEY_PRESS | libtcod.EVENT_MOUSE, key, mouse)
 
-            if item_dropped:
-                entities.append(item_dropped)
+        render_all(con, panel, cursor, session.entities, session.player, session.game_map, session.fov_map,
+                    session.fov_recompute, session.message_log, constants['screen_width'], constants['screen_height'],
+                    constants['bar_width'], constants['panel_width'], constants['panel_x'],
+                    mouse, constants['colors'], session.game_state, session.targeting_item, key, map_renderer,
+                    camera, profiler)
 
-                game_state = GameStates.ENEMY_TURN
+        session.fov_recompute = False
 
-            if xp:
-                leveled_up = player.level.add_xp(xp)
-                message_log.add_message(Message('You gain {0} experience'.format(xp)))
+        with profiler.phase('flush'):
+            libtcod.console_flush()
 
-                if leveled_up:
-                    message_log.add_message(Message(
-                        'Your battle skills grow stronger! You reached level {0}!'.format(
-                            player.level.current_level), libtcod.yellow))
-                    previous_game_state = game_state
-                    game_state = GameStates.LEVEL_UP
+        with profiler.phase('clear'):
+            clear_all(con, session.entities, session.fov_map, session.game_map, camera)
 
-        # === MONSTER TURN ===
-        if game_state == GameStates.ENEMY_TURN:
-            for entity in entities:
-                if entity.ai:
-                    enemy_turn_results = entity.ai.take_turn(player, fov_map, game_map, entities)
+        # === PLAYER AND MONSTER TURN ===
+        with profiler.phase('input'):
+            action = handle_keys(key, session.game_state)
+            mouse_action = handle_mouse(mouse, camera)
 
-                    for enemy_turn_result in enemy_turn_results:
-                        message = enemy_turn_result.get('message')
-                        dead_entity = enemy_turn_result.get('dead')
+        if action.get('toggle_profiler'):
+            profiler.show = not profiler.show
 
-                        if message:
-                            message_log.add_message(message)
+        results = session.step(action, mouse_action)
+        autosave.record(session, action, mouse_action)
+        if recorder:
+            recorder.record(session, action, mouse_action)
 
-                        if dead_entity:
-                            if dead_entity == player:
-                                message, game_state = kill_player(dead_entity)
-                            else:
-                                message = kill_monster(dead_entity)
+        profiler.end_frame()
 
-                            message_log.add_message(message)
+        if results.get('exit'):
+            session.close()
+            if recorder:
+                recorder.close(session)
 
-                            if game_state == GameStates.PLAYER_DEAD:
-                                break
+            if session.game_state == GameStates.PLAYER_DEAD:
+                # Delete save file if player exits after dying
+                autosave.delete()
+            else:
+                autosave.checkpoint(session)
+                autosave.close()
+            return True
 
-                    if game_state == GameStates.PLAYER_DEAD:
-                        break
+        if results.get('fullscreen'):
+            libtcod.console_set_fullscreen(not libtcod.console_is_fullscreen())  # toggle on/off
 
-            else:
-                game_state = GameStates.PLAYER_TURN
+    session.close()
+    autosave.close()
+    if recorder:
+        recorder.close(session)
 
 
-def main():
+def main(seed=None, profile_path=None, record_path=None):
     """Main loop.
 
-    TO DO
+    New games use seed for dungeon generation (random if None). Frame
+    timings are written to profile_path (.csv or .jsonl) and games are
+    recorded to record_path if they are given.
     """
     constants = get_constants()
+    profiler = FrameProfiler(constants['profile_window'], profile_path)
 
     # === Console ===
     # libtcod.console_set_custom_font('terminal10x16_gs_tc.png', libtcod.FONT_TYPE_GREYSCALE | libtcod.FONT_LAYOUT_TCOD)
@@ -309,9 +134,9 @@ def main():
     libtcod.console_init_root(constants['screen_width'], constants['screen_height'],
                                 constants['window_title'], False)
 
-    con = libtcod.console_new(constants['map_width'], constants['map_height'])
+    con = libtcod.console_new(constants['viewport_width'], constants['viewport_height'])
     panel = libtcod.console_new(constants['panel_width'], constants['screen_height'])
-    cursor = libtcod.console_new(constants['map_width'], constants['map_height'])
+    cursor = libtcod.console_new(constants['viewport_width'], constants['viewport_height'])
 
     # Initialize game variables
     player = None
@@ -350,25 +175,40 @@ def main():
             if show_load_error_message and (new_game or load_saved_game or exit_game):
                 show_load_error_message = False
             elif new_game:
-                player, entities, game_map, message_log, game_state = get_game_variables(constants)
+                player, entities, game_map, message_log, game_state = get_game_variables(
+                    constants, seed, lambda builder: build_floor(builder, constants))
                 game_state = GameStates.PLAYER_TURN
+                resume = False
 
                 show_main_menu = False
             elif load_saved_game:
                 try:
                     player, entities, game_map, message_log, game_state = load_game()
+                    resume = True
                     show_main_menu = False
-                except FileNotFoundError:
+                except (FileNotFoundError, ValueError):
+                    # Missing file, or a truncated save or one of an older version
                     show_load_error_message = True
             elif exit_game:
                 break
 
         else:
             libtcod.console_clear(con)
-            play_game(player, entities, game_map, message_log, game_state, con, panel, cursor, constants)
+            play_game(player, entities, game_map, message_log, game_state, con, panel, cursor, constants, profiler,
+                      resume, record_path)
 
             show_main_menu = True
 
+    profiler.close()
+
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', type=int, default=None, help='seed for new games')
+    parser.add_argument('--profile', default=None, metavar='FILE',
+                        help='write frame timings to FILE (.csv or .jsonl)')
+    parser.add_argument('--record', default=None, metavar='FILE',
+                        help='record the game to FILE (play it back with replay.py)')
+    args = parser.parse_args()
+
+    main(args.seed, args.profile, args.record)
@@ -1,4 +1,3 @@
-import libtcodpy as libtcod
 import math
 
 from components.item import Item
@@ -9,7 +8,7 @@ class Entity:
     """A generic object to represent the player, enemies, items, etc."""
 
     def __init__(self, x, y, char, color, name, blocks=False, render_order=RenderOrder.CORPSE,
-                    fighter=None, ai=None, item=None, inventory=None, stairs=None, level=None, equipment=None, equippable=None, description=None):
+                    fighter=None, ai=None, item=None, inventory=None, stairs=None, level=None, equipment=None, equippable=None, description=None, template=None):
         self.x = x
         self.y = y
         self.char = char
@@ -26,6 +25,10 @@ class Entity:
         self.equipment = equipment
         self.equippable = equippable
         self.description = description
+        # Id of the monster / item (or 'player', 'stairs') the entity was created from
+        self.template = template
+        # Set while the entity is part of an EntityList
+        self.spatial_index = None
 
         # Components are owned by the entity
         if self.fighter:
@@ -59,24 +62,15 @@ class Entity:
 
     def move(self, dx, dy):
         """Move entity by a given amount."""
-        self.x += dx
-        self.y += dy
+        self.place(self.x + dx, self.y + dy)
 
-    def take_step(self, dx, dy, game_map):
-        movement_mod = game_map.tiles[self.x][self.y].movement_mod
-        self.fighter.movement_mod = movement_mod
-        print(self.name, self.fighter.movement_mod)
-
-        if self.fighter and movement_mod is not None:
-            penalty_interval = 1 / movement_mod
-            self.fighter.turn += 1
-            if self.fighter.turn == penalty_interval:
-                dx = dy = 0
-                self.fighter.turn = 0
-                print(f"{self.name} skipped a turn")
-
-        self.move(dx, dy)
+    def place(self, x, y):
+        """Put entity at (x, y) and keep the spatial index up to date."""
+        if self.spatial_index is not None:
+            self.spatial_index.relocate(self, x, y)
 
+        self.x = x
+        self.y = y
 
     def move_towards(self, target_x, target_y, game_map, entities):
         """Move towards target if map tile is passable and no blocking entities
@@ -90,57 +84,29 @@ class Entity:
 
         if not (game_map.is_blocked(self.x + dx, self.y + dy) or
                 get_blocking_entities_at_location(entities, self.x + dx, self.y + dy)):
-            self.take_step(dx, dy, game_map)
+            self.move(dx, dy)
 
     def distance(self, x, y):
         """Return distance between entity and arbitrary point."""
         return math.sqrt((x - self.x) ** 2 + (y - self.y) ** 2)
 
-    def move_astar(self, target, entities, game_map):
-        """Implementation of the A* algorithm for path calculation."""
-        # Create a FOV map that has the dimensions of the map
-        fov = libtcod.map_new(game_map.width, game_map.height)
-
-        # Scan the current map each turn and set all the walls as unwalkable
-        for y1 in range(game_map.height):
-            for x1 in range(game_map.width):
-                libtcod.map_set_properties(fov, x1, y1, not game_map.tiles[x1][y1].block_sight,
-                                           not game_map.tiles[x1][y1].blocked)
-
-        # Scan all the objects to see if there are objects that must be navigated around
-        # Check also that the object isn't self or the target (so that the start and the end points are free)
-        # The AI class handles the situation if self is next to the target so it will not use this A* function anyway
-        for entity in entities:
-            if entity.blocks and entity != self and entity != target:
-                # Set the tile as a wall so it must be navigated around
-                libtcod.map_set_properties(fov, entity.x, entity.y, True, False)
-
-        # Allocate a A* path
-        # 1.41 = sqrt(1sq + 1sq)
-        # The 1.41 is the normal diagonal cost of moving, it can be set as 0.0 if diagonal moves are prohibited
-        my_path = libtcod.path_new_using_map(fov, 1.41)
-
-        # Compute the path between self's coordinates and the target's coordinates
-        libtcod.path_compute(my_path, self.x, self.y, target.x, target.y)
-
-        # Check if the path exists, and in this case, also the path is shorter than 25 tiles
-        # The path size matters if you want the monster to use alternative longer paths (for example through other rooms) if for example the player is in a corridor
-        # It makes sense to keep path size relatively low to keep the monsters from running around the map if there's an alternative path really far away
-        if not libtcod.path_is_empty(my_path) and libtcod.path_size(my_path) < 25:
-            # Find the next coordinates in the computed full path
-            x, y = libtcod.path_walk(my_path, True)
-            if x or y:
-                # Set self's coordinates to the next path tile
-                self.x = x
-                self.y = y
+    def move_downhill(self, target, entities, game_map):
+        """
+        Step along the distance field of the game map's path map towards the
+        target (the distance field is shared by all monsters, see PathMap).
+        """
+        path_map = game_map.path_map
+        path_map.compute(target.x, target.y)
+
+        step = path_map.next_step(self.x, self.y, entities)
+        if step:
+            dx, dy = step
+            self.move(dx, dy)
         else:
             # Keep the old move function as a backup so that if there are no paths (for example another monster blocks a corridor)
             # it will still try to move towards the player (closer to the corridor opening)
             self.move_towards(target.x, target.y, game_map, entities)
 
-        # Delete the path to free memory
-        libtcod.path_delete(my_path)
-
     def distance_to(self, other):
         """Calculate distance to target coordinate."""
         dx = other.x - self.x
@@ -150,11 +116,83 @@ class Entity:
     def __repr__(self):
         return self.name
 
+    def __getstate__(self):
+        # The spatial index is rebuilt when the EntityList is loaded
+        state = self.__dict__.copy()
+        state['spatial_index'] = None
+        return state
+
+
+class EntityList(list):
+    """
+    List of the entities on the map with a spatial index (occupancy grid).
+
+    Entities are registered on append and unregistered on remove, their
+    position in the index is updated by Entity.place (and Entity.move).
+    Location queries then only look at the entities on the requested tiles
+    instead of scanning the whole list.
+    """
+    def __init__(self, entities=()):
+        super().__init__()
+        self._cells = {}
+        self.extend(entities)
+
+    def append(self, entity):
+        super().append(entity)
+        self._cells.setdefault((entity.x, entity.y), []).append(entity)
+        entity.spatial_index = self
+
+    def extend(self, entities):
+        for entity in entities:
+            self.append(entity)
+
+    def remove(self, entity):
+        super().remove(entity)
+        self._unregister(entity, entity.x, entity.y)
+        entity.spatial_index = None
+
+    def relocate(self, entity, x, y):
+        """Move entity to another cell of the index."""
+        self._unregister(entity, entity.x, entity.y)
+        self._cells.setdefault((x, y), []).append(entity)
+
+    def _unregister(self, entity, x, y):
+        cell = self._cells[(x, y)]
+        cell.remove(entity)
+        if not cell:
+            del self._cells[(x, y)]
+
+    def at(self, x, y):
+        """Return all entities at location."""
+        return tuple(self._cells.get((x, y), ()))
+
+    def blocking_at(self, x, y):
+        """Return the blocking entity at location (or None)."""
+        for entity in self._cells.get((x, y), ()):
+            if entity.blocks:
+                return entity
+
+        return None
+
+    def within_radius(self, x, y, radius):
+        """Return all entities with a distance of at most radius to (x, y)."""
+        r = int(radius)
+        if (2 * r + 1) ** 2 > len(self._cells):
+            # Fewer occupied cells than cells in range, check the occupied ones
+            cells = self._cells.items()
+        else:
+            cells = [((a, b), self._cells[(a, b)])
+                     for a in range(x - r, x + r + 1) for b in range(y - r, y + r + 1)
+                     if (a, b) in self._cells]
+
+        return [entity for (a, b), entities in cells
+                if math.sqrt((a - x) ** 2 + (b - y) ** 2) <= radius
+                for entity in entities]
+
+    def __reduce__(self):
+        return EntityList, (list(self),)
+
 
 def get_blocking_entities_at_location(entities, destination_x, destination_y):
     """Check for blocking entities at the target location."""
-    for entity in entities:
-        if entity.blocks and entity.x == destination_x and entity.y == destination_y:
-            return entity
-
-    return None
+    return entities.blocking_at(destination_x, destination_y)
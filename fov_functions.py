@@ -5,11 +5,13 @@ def initialize_fov(game_map):
     """Initialize a FOV map that defines which tiles are lit."""
     fov_map = libtcod.map_new(game_map.width, game_map.height)
 
-    for y in range(game_map.height):
-        for x in range(game_map.width):
-            libtcod.map_set_properties(
-                        fov_map, x, y, not game_map.tiles[x][y].block_sight,
-                        not game_map.tiles[x][y].blocked)
+    tiles = game_map.tiles
+    blocked = tiles.blocked_mask()
+    block_sight = tiles.block_sight_mask()
+
+    for i in range(len(blocked)):
+        x, y = tiles.coordinates(i)
+        libtcod.map_set_properties(fov_map, x, y, not block_sight[i], not blocked[i])
 
     return fov_map
 
@@ -0,0 +1,435 @@
+import libtcodpy as libtcod
+
+from components.ai import BasicMonster, base_ai
+from death_functions import kill_monster, kill_player
+from entity import get_blocking_entities_at_location
+from fov_functions import initialize_fov, recompute_fov
+from game_messages import Message
+from game_states import GameStates
+from map_objects.floor_builder import FloorBuilder
+from map_objects.floor_pregenerator import FloorPregenerator
+from profiler import FrameProfiler
+from turn_scheduler import ACTION_COST, TurnScheduler, move_cost
+
+
+class GameSession:
+    """
+    Game state and turn logic of a running game.
+
+    Does not depend on a window: actions (as returned by the input handlers)
+    are passed to step(), rendering and saving are left to the caller.
+    build_floor(builder) completes the FloorBuilder of the next floor, e.g.
+    a slice per frame with a progress bar (by default in one go).
+    """
+    def __init__(self, player, entities, game_map, message_log, game_state, constants, profiler=None,
+                 build_floor=None):
+        self.player = player
+        self.entities = entities
+        self.game_map = game_map
+        self.message_log = message_log
+        self.constants = constants
+        # Times the fov and enemy phases of the main loop (not timed by default)
+        self.profiler = profiler or FrameProfiler(enabled=False)
+        self.build_floor = build_floor or FloorBuilder.finish
+
+        self.game_state = GameStates.PLAYER_TURN
+        self.previous_game_state = self.game_state
+
+        # Keep track of targeting item
+        self.targeting_item = None
+
+        # Number of completed turns
+        self.turn = 0
+        # Name of the monster that killed the player
+        self.killed_by = None
+        # Energy cost of the player's last action
+        self.action_cost = ACTION_COST
+
+        self.fov_map = initialize_fov(game_map)
+        self.recompute_fov()
+
+        self.schedule_actors()
+
+        self.pregenerator = None
+        if constants['pregenerate_floors']:
+            self.pregenerator = FloorPregenerator()
+            self.pregenerator.start(game_map, game_map.dungeon_level + 1)
+
+    def close(self):
+        """Stop background work."""
+        if self.pregenerator:
+            self.pregenerator.shutdown()
+
+    def recompute_fov(self):
+        """Recompute FOV at the player's position (flags it for rendering)."""
+        with self.profiler.phase('fov'):
+            recompute_fov(self.fov_map, self.player.x, self.player.y, self.constants['fov_radius'],
+                          self.constants['fov_light_walls'], self.constants['fov_algorithm'])
+        self.fov_recompute = True
+
+    def step(self, action, mouse_action=None):
+        """
+        Handle one player action and the enemy turn that may follow.
+
+        Return dict with requests for the caller ('exit', 'fullscreen').
+        """
+        player = self.player
+        colors = self.constants['colors']
+        mouse_action = mouse_action or {}
+
+        move = action.get('move')
+        wait = action.get('wait')
+        pickup = action.get('pickup')
+        show_inventory = action.get('show_inventory')
+        show_equipment = action.get('show_equipment')
+        drop_inventory = action.get('drop_inventory')
+        inventory_index = action.get('inventory_index')
+        take_stairs = action.get('take_stairs')
+        level_up = action.get('level_up')
+        show_character_screen = action.get('show_character_screen')
+        exit = action.get('exit')
+        fullscreen = action.get('fullscreen')
+
+        left_click = mouse_action.get('left_click')
+        right_click = mouse_action.get('right_click')
+
+        results = {}
+        player_turn_results = []
+        fov_recompute = False
+
+        # Check what player did this turn
+        if move and self.game_state == GameStates.PLAYER_TURN:
+            dx, dy = move
+            destination_x = player.x + dx
+            destination_y = player.y + dy
+            # Check if tile is passable
+            if not self.game_map.is_blocked(destination_x, destination_y):
+                target = get_blocking_entities_at_location(self.entities, destination_x, destination_y)
+
+                if target:
+                    attack_results = player.fighter.attack(target)
+                    player_turn_results.extend(attack_results)
+                    self.make_noise(player.x, player.y)
+                else:
+                    self.action_cost = move_cost(self.game_map.tiles, player.x, player.y)
+                    player.move(dx, dy)
+
+                    # Recompute FOV everytime the player moves
+                    fov_recompute = True
+
+                self.game_state = GameStates.ENEMY_TURN
+
+        elif wait:
+            self.game_state = GameStates.ENEMY_TURN
+
+        elif pickup and self.game_state == GameStates.PLAYER_TURN:
+            for entity in self.entities.at(player.x, player.y):
+                if entity.item:
+                    pickup_results = player.inventory.add_item(entity)
+                    player_turn_results.extend(pickup_results)
+
+                    break
+            else:
+                self.message_log.add_message(Message('There is nothing here to pick up.', colors['text_warning']))
+
+        if show_inventory:
+            self.previous_game_state = self.game_state
+            self.game_state = GameStates.SHOW_INVENTORY
+
+        if show_equipment:
+            self.previous_game_state = self.game_state
+            self.game_state = GameStates.SHOW_EQUIPMENT
+
+        if drop_inventory:
+            self.previous_game_state = self.game_state
+            self.game_state = GameStates.DROP_INVENTORY
+
+        if inventory_index is not None and self.previous_game_state != GameStates.PLAYER_DEAD \
+                and inventory_index < len(player.inventory.items):
+                item = player.inventory.items[inventory_index]
+
+                if self.game_state == GameStates.SHOW_INVENTORY:
+                    player_turn_results.extend((player.inventory.use(item, entities=self.entities, fov_map=self.fov_map)))
+
+                elif self.game_state == GameStates.SHOW_EQUIPMENT:
+                        item = player.equipment.equipped[inventory_index]
+                        player_turn_results.extend((player.inventory.use(item, entities=self.entities, fov_map=self.fov_map)))
+
+                elif self.game_state == GameStates.DROP_INVENTORY:
+                    player_turn_results.extend((player.inventory.drop_item(item)))
+
+        if take_stairs and self.game_state == GameStates.PLAYER_TURN:
+            for entity in self.entities.at(player.x, player.y):
+                if entity.stairs:
+                    self.next_floor()
+                    fov_recompute = True
+
+                    break
+            else:
+                self.message_log.add_message(Message('There are no stairs here.', colors['text_warning']))
+
+        if level_up:
+            if level_up == 'hp':
+                player.fighter.base_max_hp += 20
+                player.fighter.hp += 20
+            elif level_up == 'str':
+                player.fighter.base_power += 1
+            elif level_up == 'def':
+                player.fighter.base_defense += 1
+
+            self.game_state = self.previous_game_state
+
+        if show_character_screen:
+            self.previous_game_state = self.game_state
+            self.game_state = GameStates.CHARACTER_SCREEN
+
+        if self.game_state == GameStates.TARGETING:
+            if left_click:
+                target_x, target_y = left_click
+
+                item_use_results = player.inventory.use(self.targeting_item, entities=self.entities,
+                                                        fov_map=self.fov_map, target_x=target_x, target_y=target_y)
+                player_turn_results.extend(item_use_results)
+            elif right_click:
+                player_turn_results.append({'targeting_cancelled': True})
+
+        if exit:
+            if self.game_state in {GameStates.SHOW_INVENTORY, GameStates.SHOW_EQUIPMENT,
+                                   GameStates.DROP_INVENTORY, GameStates.CHARACTER_SCREEN}:
+                self.game_state = self.previous_game_state
+            elif self.game_state == GameStates.TARGETING:
+                player_turn_results.append({'targeting_cancelled': True})
+            else:
+                # Caller saves the game (or deletes the save file if the player is dead)
+                results['exit'] = True
+                return results
+
+        if fullscreen:
+            results['fullscreen'] = True
+
+        self.handle_player_turn_results(player_turn_results)
+
+        if fov_recompute:
+            self.recompute_fov()
+
+        if self.game_state == GameStates.ENEMY_TURN:
+            with self.profiler.phase('enemy'):
+                self.enemy_turn()
+
+        return results
+
+    def next_floor(self):
+        """Go down the stairs, continuing the pregenerated floor if there is one."""
+        next_level = self.game_map.dungeon_level + 1
+        builder = self.pregenerator.take(next_level) if self.pregenerator else None
+        if builder is None:
+            builder = FloorBuilder(self.game_map.new_dungeon(next_level))
+        self.build_floor(builder)
+
+        self.entities = self.game_map.next_floor(self.player, self.message_log, self.constants, builder.dungeon)
+        self.fov_map = initialize_fov(self.game_map)
+        self.schedule_actors()
+
+        if self.pregenerator:
+            self.pregenerator.start(self.game_map, next_level + 1)
+
+    def handle_player_turn_results(self, player_turn_results):
+        """At the end of the player's turn, evaluate results and print messages to log."""
+        player = self.player
+        message_log = self.message_log
+        colors = self.constants['colors']
+
+        for player_turn_result in player_turn_results:
+            message = player_turn_result.get('message')
+            dead_entity = player_turn_result.get('dead')
+            item_added = player_turn_result.get('item_added')
+            item_consumed = player_turn_result.get('consumed')
+            item_dropped = player_turn_result.get('item_dropped')
+            equip = player_turn_result.get('equip')
+            targeting = player_turn_result.get('targeting')
+            targeting_cancelled = player_turn_result.get('targeting_cancelled')
+            xp = player_turn_result.get('xp')
+            affected = player_turn_result.get('affected')
+
+            if message:
+                message_log.add_message(message)
+
+            if targeting_cancelled:
+                self.game_state = self.previous_game_state
+
+                message_log.add_message(Message('Targeting cancelled'))
+
+            if dead_entity:
+                if dead_entity == player:
+                    message, self.game_state = kill_player(dead_entity)
+                else:
+                    message = kill_monster(dead_entity)
+                    self.scheduler.remove(dead_entity)
+
+                message_log.add_message(message)
+
+            if affected and affected.fighter and affected.ai and affected not in self.scheduler:
+                # The effect only wears off in the monster's turns, even if
+                # it is too far away to be woken
+                self.scheduler.add(affected)
+
+            if item_added:
+                # Remove item from map (now in inventory)
+                self.entities.remove(item_added)
+                # Takes a turn
+                self.game_state = GameStates.ENEMY_TURN
+
+            if item_consumed:
+                # Casting is loud
+                self.make_noise(player.x, player.y)
+                self.game_state = GameStates.ENEMY_TURN
+
+            if equip:
+                equip_results = player.equipment.toggle_equip(equip)
+
+                for equip_result in equip_results:
+                    equipped = equip_result.get('equipped')
+                    dequipped = equip_result.get('dequipped')
+
+                    if equipped:
+                        message_log.add_message(Message('You equipped the {0}'.format(equipped.name), colors['text_equip']))
+
+                    if dequipped:
+                        message_log.add_message(Message('You dequipped the {0}'.format(dequipped.name), colors['text_unequip']))
+
+                self.game_state = GameStates.ENEMY_TURN
+
+            if targeting:
+                self.previous_game_state = GameStates.PLAYER_TURN
+                self.game_state = GameStates.TARGETING
+
+                self.targeting_item = targeting
+
+                message_log.add_message(self.targeting_item.item.targeting_message)
+
+            if item_dropped:
+                self.entities.append(item_dropped)
+
+                self.game_state = GameStates.ENEMY_TURN
+
+            if xp:
+                leveled_up = player.level.add_xp(xp)
+                message_log.add_message(Message('You gain {0} experience'.format(xp)))
+
+                if leveled_up:
+                    message_log.add_message(Message(
+                        'Your battle skills grow stronger! You reached level {0}!'.format(
+                            player.level.current_level), libtcod.yellow))
+                    self.previous_game_state = self.game_state
+                    self.game_state = GameStates.LEVEL_UP
+
+    def schedule_actors(self):
+        """
+        Put the player and the awake monsters of the floor into a new turn
+        order. Actors keep their ranks (e.g. from a save), so they act in the
+        same order at equal ticks as before.
+        """
+        ranks = [entity.fighter.rank for entity in self.entities
+                 if entity.fighter and entity.fighter.rank is not None]
+        self.scheduler = TurnScheduler(max(ranks, default=-1) + 1)
+        self.scheduler.add(self.player)
+        for entity in self.entities:
+            if entity.ai and self.is_awake(entity):
+                self.scheduler.add(entity)
+
+        self.wake_monsters()
+        self.monster_turns()
+
+    @staticmethod
+    def is_awake(entity):
+        """Return True if the monster takes turns (monsters under an effect always do)."""
+        ai = base_ai(entity.ai)
+        return ai is not entity.ai or not isinstance(ai, BasicMonster) or ai.awake
+
+    def wake(self, entity):
+        """Make a dormant monster take turns."""
+        ai = base_ai(entity.ai)
+        if isinstance(ai, BasicMonster):
+            ai.awake = True
+        if entity not in self.scheduler:
+            self.scheduler.add(entity)
+
+    def wake_monsters(self):
+        """Wake the dormant monsters that see the player or are close to them."""
+        player = self.player
+        wake_radius = self.constants['wake_radius']
+        radius = max(self.constants['fov_radius'], wake_radius)
+
+        for entity in self.entities.within_radius(player.x, player.y, radius):
+            if entity.ai and entity not in self.scheduler and (
+                    entity.distance_to(player) <= wake_radius or
+                    libtcod.map_is_in_fov(self.fov_map, entity.x, entity.y)):
+                self.wake(entity)
+
+    def make_noise(self, x, y):
+        """Wake the dormant monsters that can hear a noise at (x, y)."""
+        for entity in self.entities.within_radius(x, y, self.constants['noise_radius']):
+            if entity.ai and entity not in self.scheduler:
+                self.wake(entity)
+
+    def enemy_turn(self):
+        """Charge the player's action and let monsters act until it is the player's turn again."""
+        self.scheduler.spend(self.player, self.action_cost)
+        self.action_cost = ACTION_COST
+
+        # Distance field to the player is shared by all monsters
+        self.game_map.path_map.compute(self.player.x, self.player.y)
+
+        self.wake_monsters()
+        self.monster_turns()
+
+        if self.game_state != GameStates.PLAYER_DEAD:
+            self.game_state = GameStates.PLAYER_TURN
+
+        self.turn += 1
+
+    def monster_turns(self):
+        """
+        Let monsters act in turn order until the player is next (dormant
+        monsters are not in the turn order).
+        """
+        player = self.player
+        message_log = self.message_log
+        scheduler = self.scheduler
+
+        while self.game_state != GameStates.PLAYER_DEAD:
+            entity = scheduler.next_actor()
+            if entity is player or entity is None:
+                break
+
+            x, y = entity.x, entity.y
+            enemy_turn_results = entity.ai.take_turn(player, self.fov_map, self.game_map, self.entities)
+
+            if (entity.x, entity.y) != (x, y):
+                scheduler.spend(entity, move_cost(self.game_map.tiles, x, y))
+            else:
+                scheduler.spend(entity)
+
+            for enemy_turn_result in enemy_turn_results:
+                message = enemy_turn_result.get('message')
+                dead_entity = enemy_turn_result.get('dead')
+                dormant = enemy_turn_result.get('dormant')
+
+                if message:
+                    message_log.add_message(message)
+
+                if dormant:
+                    scheduler.remove(dormant)
+
+                if dead_entity:
+                    if dead_entity == player:
+                        self.killed_by = entity.name
+                        message, self.game_state = kill_player(dead_entity)
+                    else:
+                        message = kill_monster(dead_entity)
+                        scheduler.remove(dead_entity)
+
+                    message_log.add_message(message)
+
+                    if self.game_state == GameStates.PLAYER_DEAD:
+                        break
@@ -0,0 +1,85 @@
+"""
+Run the game without a window (soak tests, bots, benchmarks).
+
+An agent is a function that gets the GameSession and returns the next
+(action, mouse_action) pair, in the format of handle_keys / handle_mouse,
+or None to stop. Running this module lets a random walker play:
+
+    python headless.py --turns 10000
+"""
+import argparse
+import random
+import time
+
+from game_session import GameSession
+from game_states import GameStates
+from loader_functions.initialize_new_game import get_constants, get_game_variables
+
+
+DIRECTIONS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+
+def new_session(constants=None, seed=None):
+    """Start a new game."""
+    if constants is None:
+        constants = get_constants()
+
+    player, entities, game_map, message_log, game_state = get_game_variables(constants, seed)
+
+    return GameSession(player, entities, game_map, message_log, game_state, constants)
+
+
+def run(session, agent, max_turns, max_steps=None):
+    """
+    Feed the agent's actions into the session until max_turns turns are
+    completed, the player died or the agent stops.
+
+    max_steps limits the number of actions (actions in menus take no turn).
+    Return number of steps taken.
+    """
+    if max_steps is None:
+        max_steps = max_turns * 10
+
+    steps = 0
+    while session.turn < max_turns and steps < max_steps and session.game_state != GameStates.PLAYER_DEAD:
+        actions = agent(session)
+        if actions is None:
+            break
+
+        action, mouse_action = actions
+        results = session.step(action, mouse_action)
+        steps += 1
+
+        if results.get('exit'):
+            break
+
+    return steps
+
+
+def random_walker(session):
+    """Move in a random direction (attacking whatever is in the way)."""
+    return {'move': random.choice(DIRECTIONS)}, {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Let a random walker play without a window.')
+    parser.add_argument('--turns', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    session = new_session(seed=args.seed)
+
+    start = time.perf_counter()
+    steps = run(session, random_walker, args.turns)
+    elapsed = time.perf_counter() - start
+    session.close()
+
+    print('seed {0}: {1} turns ({2} actions) in {3:.2f}s, {4:.1f} turns/s'.format(
+        session.game_map.seed, session.turn, steps, elapsed, session.turn / elapsed))
+    if session.game_state == GameStates.PLAYER_DEAD:
+        print('player died on dungeon level {0}'.format(session.game_map.dungeon_level))
+
+
+if __name__ == '__main__':
+    main()
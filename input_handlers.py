@@ -5,6 +5,10 @@ from game_states import GameStates
 
 def handle_keys(key, game_state):
     """Call input function depending on game state and return its result."""
+    if key.vk == libtcod.KEY_F3:
+        # Any state: toggle the frame timing overlay
+        return {'toggle_profiler': True}
+
     if game_state == GameStates.PLAYER_TURN:
         return handle_player_turn_keys(key)
     elif game_state == GameStates.PLAYER_DEAD:
@@ -172,13 +176,15 @@ def handle_character_screen(key):
     return {}
 
 
-def handle_mouse(mouse):
-    """Handle mouse input."""
-    (x, y) = (mouse.cx, mouse.cy)
+def handle_mouse(mouse, camera):
+    """Handle mouse input, clicks are returned in map coordinates (clicks outside the map view are ignored)."""
+    cell = camera.to_world(mouse.cx, mouse.cy)
+    if cell is None:
+        return {}
 
     if mouse.lbutton_pressed:
-        return {'left_click': (x, y)}
+        return {'left_click': cell}
     elif mouse.rbutton_pressed:
-        return {'right_click': (x, y)}
+        return {'right_click': cell}
 
     return {}
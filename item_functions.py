@@ -34,7 +34,7 @@ def cast_lightning(*args, **kwargs):
 
     closest_distance = maximum_range + 1
 
-    for entity in entities:
+    for entity in entities.within_radius(caster.x, caster.y, maximum_range):
         if entity.fighter and entity != caster and libtcod.map_is_in_fov(fov_map, entity.x, entity.y):
             distance = caster.distance_to(entity)
 
@@ -72,8 +72,8 @@ def cast_fireball(*args, **kwargs):
     results.append({'consumed': True, 'message': Message(
             'The fireball explodes, burning everything within {0} tiles!'.format(radius))})
 
-    for entity in entities:
-        if entity.distance(target_x, target_y) <= radius and entity.fighter:
+    for entity in entities.within_radius(target_x, target_y, radius):
+        if entity.fighter:
             results.append({'message': Message('The {0} gets burned for {1} hit points.'.format(entity.name, damage), libtcod.orange)})
             results.extend(entity.fighter.take_damage(damage))
 
@@ -94,16 +94,15 @@ def cast_confuse(*args, **kwargs):
             'You cannot target a tile outside your field of view.', libtcod.red)})
         return results
 
-    for entity in entities:
-        if entity.x == target_x and entity.y == target_y:
-            confused_ai = ConfusedMonster(entity.ai, 10)
+    for entity in entities.at(target_x, target_y):
+        confused_ai = ConfusedMonster(entity.ai, 10)
 
-            confused_ai.owner = entity
-            entity.ai = confused_ai
+        confused_ai.owner = entity
+        entity.ai = confused_ai
 
-            results.append({'consumed': True, 'message': Message(
-                'The eyes of the {0} look vacant, as it starts to stumble around.'.format(entity.name), libtcod.light_green)})
-            break
+        results.append({'consumed': True, 'affected': entity, 'message': Message(
+            'The eyes of the {0} look vacant, as it starts to stumble around.'.format(entity.name), libtcod.light_green)})
+        break
 
     return results
 
@@ -127,8 +126,8 @@ def cast_freeze(*args, **kwargs):
     results.append({'consumed': True, 'message': Message(
             'The spell succeeds, freezing everything within {0} tiles!'.format(radius))})
 
-    for entity in entities:
-        if entity.distance(target_x, target_y) <= radius and entity.fighter:
+    for entity in entities.within_radius(target_x, target_y, radius):
+        if entity.fighter:
             results.append({'message': Message('The {0} freezes in place and takes {1} damage'.format(entity.name, damage), libtcod.light_blue)})
             results.extend(entity.fighter.take_damage(damage))
 
@@ -136,5 +135,6 @@ def cast_freeze(*args, **kwargs):
 
             frozen_ai.owner = entity
             entity.ai = frozen_ai
+            results.append({'affected': entity})
 
     return results
@@ -0,0 +1,210 @@
+"""
+Journaled autosave.
+
+A full save (checkpoint, see save_format) is written every few turns and
+whenever the player reaches a new floor. In between, every action that is
+passed to GameSession.step is appended to a journal file and flushed, so a
+crash loses at most the action in progress. Loading replays the journal on
+top of the checkpoint (the game is deterministic given the actions, the
+game map's rng is part of the checkpoint).
+
+Journal layout (little-endian):
+
+    header      magic b'SPJL', u16 version, u32 crc32 of the checkpoint
+                the journal continues (other journals are ignored)
+    entry       u8 op count, ops, u32 crc32 of the game map rng state
+                after the step (replay stops at the first mismatch)
+    op          u8 code, arguments (see ACTIONS)
+"""
+import os
+import struct
+import zlib
+
+from game_states import GameStates
+from loader_functions.data_loaders import SAVE_FILE, save_game
+
+
+JOURNAL_FILE = 'savegame.journal'
+
+MAGIC = b'SPJL'
+VERSION = 1
+
+# Action key: (op code, argument format), arguments of 'move' and the
+# clicks are (x, y) pairs, level_up is the index in LEVEL_UP_CHOICES
+ACTIONS = {
+    'move': (1, 'bb'),
+    'wait': (2, ''),
+    'pickup': (3, ''),
+    'show_inventory': (4, ''),
+    'show_equipment': (5, ''),
+    'drop_inventory': (6, ''),
+    'inventory_index': (7, 'B'),
+    'take_stairs': (8, ''),
+    'level_up': (9, 'B'),
+    'show_character_screen': (10, ''),
+    'exit': (11, ''),
+}
+MOUSE_ACTIONS = {
+    'left_click': (12, 'hh'),
+    'right_click': (13, 'hh'),
+}
+LEVEL_UP_CHOICES = ('hp', 'str', 'def')
+
+OPS = {code: (key, fmt, key in MOUSE_ACTIONS) for actions in (ACTIONS, MOUSE_ACTIONS)
+       for key, (code, fmt) in actions.items()}
+
+
+def rng_check(game_map):
+    """Return crc32 of the game map's rng state."""
+    version, internal, gauss_next = game_map.rng.getstate()
+    return zlib.crc32(struct.pack('<625I', *internal))
+
+
+def encode_ops(action, mouse_action):
+    """Return the journal ops of an action and mouse action (b'' if there are none)."""
+    ops = bytearray()
+    count = 0
+
+    for actions, table in ((action, ACTIONS), (mouse_action, MOUSE_ACTIONS)):
+        for key, value in actions.items():
+            if key not in table or value is None or value is False:
+                continue
+            code, fmt = table[key]
+
+            if key == 'level_up':
+                arguments = (LEVEL_UP_CHOICES.index(value),)
+            elif fmt == '':
+                arguments = ()
+            elif len(fmt) == 2:
+                arguments = value
+            else:
+                arguments = (value,)
+
+            ops += struct.pack('<B' + fmt, code, *arguments)
+            count += 1
+
+    if not count:
+        return b''
+    return bytes([count]) + bytes(ops)
+
+
+class Autosave:
+    """Writes checkpoints and the journal of a running game."""
+
+    def __init__(self, checkpoint_interval):
+        self.checkpoint_interval = checkpoint_interval
+        self.journal = None
+        self.checkpoint_turn = 0
+        self.checkpoint_level = None
+
+    def checkpoint(self, session):
+        """Save the full game and start a new journal."""
+        self.close()
+
+        # Energy is part of the save
+        session.scheduler.settle()
+        data = save_game(session.player, session.entities, session.game_map, session.message_log,
+                         session.game_state)
+
+        self.journal = open(JOURNAL_FILE, 'wb')
+        self.journal.write(MAGIC + struct.pack('<HI', VERSION, zlib.crc32(data)))
+        self.journal.flush()
+
+        self.checkpoint_turn = session.turn
+        self.checkpoint_level = session.game_map.dungeon_level
+
+    def record(self, session, action, mouse_action):
+        """
+        Append the action that was just passed to session.step to the journal
+        and write a checkpoint if it is due.
+        """
+        ops = encode_ops(action, mouse_action)
+        if not ops:
+            return
+
+        self.journal.write(ops + struct.pack('<I', rng_check(session.game_map)))
+        self.journal.flush()
+
+        # Checkpoints are only written between turns (menus and targeting
+        # are not part of the save)
+        if session.game_state == GameStates.PLAYER_TURN and (
+                session.game_map.dungeon_level != self.checkpoint_level or
+                session.turn - self.checkpoint_turn >= self.checkpoint_interval):
+            self.checkpoint(session)
+
+    def replay(self, session):
+        """
+        Replay the journal of the loaded checkpoint on the session.
+
+        Return number of replayed actions.
+        """
+        if not (os.path.isfile(JOURNAL_FILE) and os.path.isfile(SAVE_FILE)):
+            return 0
+
+        with open(SAVE_FILE, 'rb') as save_file:
+            checkpoint_crc = zlib.crc32(save_file.read())
+        with open(JOURNAL_FILE, 'rb') as journal_file:
+            data = journal_file.read()
+
+        header_size = len(MAGIC) + struct.calcsize('<HI')
+        if data[:len(MAGIC)] != MAGIC or struct.unpack_from('<HI', data, len(MAGIC)) != (VERSION, checkpoint_crc):
+            return 0
+
+        offset = header_size
+        replayed = 0
+        while offset < len(data):
+            try:
+                action, mouse_action, offset = self.decode_entry(data, offset)
+                check, = struct.unpack_from('<I', data, offset)
+            except (struct.error, IndexError, KeyError):
+                # Entry was cut off by a crash
+                break
+            offset += 4
+
+            session.step(action, mouse_action)
+            if rng_check(session.game_map) != check:
+                break
+            replayed += 1
+
+        return replayed
+
+    @staticmethod
+    def decode_entry(data, offset):
+        """Return action, mouse action and offset of the next value."""
+        action = {}
+        mouse_action = {}
+
+        count = data[offset]
+        offset += 1
+        for i in range(count):
+            key, fmt, is_mouse = OPS[data[offset]]
+            arguments = struct.unpack_from('<' + fmt, data, offset + 1)
+            offset += 1 + struct.calcsize('<' + fmt)
+
+            if key == 'level_up':
+                value = LEVEL_UP_CHOICES[arguments[0]]
+            elif fmt == '':
+                value = True
+            elif len(fmt) == 2:
+                value = arguments
+            else:
+                value = arguments[0]
+
+            if is_mouse:
+                mouse_action[key] = value
+            else:
+                action[key] = value
+
+        return action, mouse_action, offset
+
+    def close(self):
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+
+    def delete(self):
+        """Remove checkpoint and journal (the player died)."""
+        self.close()
+        for path in (SAVE_FILE, JOURNAL_FILE):
+            if os.path.isfile(path):
+                os.remove(path)
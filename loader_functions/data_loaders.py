@@ -1,31 +1,33 @@
 import os
-import shelve
 
-from map_objects.game_map import GameMap
+from loader_functions.save_format import dump, load
+
+
+SAVE_FILE = 'savegame.dat'
 
 
 def save_game(player, entities, game_map, message_log, game_state):
-    """Save game to shelve file."""
-    with shelve.open('savegame.dat') as data_file:
-        data_file['player_index'] = entities.index(player)
-        data_file['entities'] = entities
-        data_file['game_map'] = game_map
-        data_file['message_log'] = message_log
-        data_file['game_state'] = game_state
+    """
+    Save game to file (see save_format), return the saved data.
+
+    The save is written to a temporary file first, so a crash while saving
+    leaves the previous save intact.
+    """
+    data = dump(player, entities, game_map, message_log, game_state)
+
+    with open(SAVE_FILE + '.tmp', 'wb') as data_file:
+        data_file.write(data)
+    os.replace(SAVE_FILE + '.tmp', SAVE_FILE)
+
+    return data
 
 
 def load_game():
-    """Load game from shelve file."""
-    if not os.path.isfile('savegame.dat'):
+    """Load game from file (see save_format)."""
+    if not os.path.isfile(SAVE_FILE):
         raise FileNotFoundError
 
-    with shelve.open('savegame.dat') as data_file:
-        player_index = data_file['player_index']
-        entities = data_file['entities']
-        game_map = data_file['game_map']
-        message_log = data_file['message_log']
-        game_state = data_file['game_state']
-
-    player = entities[player_index]
+    with open(SAVE_FILE, 'rb') as data_file:
+        player, entities, game_map, message_log, game_state = load(data_file.read())
 
     return player, entities, game_map, message_log, game_state
@@ -5,10 +5,11 @@ from components.equippable import Equippable
 from components.fighter import Fighter
 from components.inventory import Inventory
 from components.level import Level
-from entity import Entity
+from entity import Entity, EntityList
 from game_messages import MessageLog
 from game_states import GameStates
 from map_objects.dungeon_generation.tunnel import Tunnel
+from map_objects.floor_builder import FloorBuilder
 from map_objects.game_map import GameMap
 from map_objects.items import dagger
 from render_functions import RenderOrder
@@ -34,9 +35,14 @@ def get_constants():
     message_width = panel_width - 2
     message_height = panel_height - 33
 
+    # Map view (the camera follows the player on maps larger than the view)
+    viewport_x = panel_width
+    viewport_width = screen_width - panel_width
+    viewport_height = screen_height
+
     # Map
-    map_width = 80 - panel_width
-    map_height = screen_height
+    map_width = viewport_width
+    map_height = viewport_height
 
     room_max_size = 13
     room_min_size = 6
@@ -45,6 +51,27 @@ def get_constants():
     fov_light_walls = True
     fov_radius = 4
 
+    # Upload the map console in bulk (BulkMapRenderer) instead of cell by cell
+    bulk_render = True
+
+    # Generate the next floor in the background (FloorPregenerator)
+    pregenerate_floors = True
+
+    # Milliseconds of dungeon generation per frame while a floor is built in
+    # the foreground (the progress bar is drawn in between)
+    generation_slice = 15
+
+    # Turns between full autosaves (actions in between are journaled)
+    checkpoint_interval = 50
+
+    # Dormant monsters wake up when they see the player, are this close to
+    # them or hear a fight / spell within noise_radius
+    wake_radius = 2
+    noise_radius = 6
+
+    # Frames the profiling overlay (F3) computes its percentiles over
+    profile_window = 300
+
     colors = {
         'dark_wall': libtcod.black,
         'dark_wall_char': libtcod.Color(28, 5, 58), #libtcod.darkest_han,
@@ -83,6 +110,9 @@ def get_constants():
         'message_x': message_x,
         'message_width': message_width,
         'message_height': message_height,
+        'viewport_x': viewport_x,
+        'viewport_width': viewport_width,
+        'viewport_height': viewport_height,
         'map_width': map_width,
         'map_height': map_height,
         'room_max_size': room_max_size,
@@ -90,37 +120,59 @@ def get_constants():
         'fov_algorithm': fov_algorithm,
         'fov_light_walls': fov_light_walls,
         'fov_radius': fov_radius,
+        'bulk_render': bulk_render,
+        'pregenerate_floors': pregenerate_floors,
+        'generation_slice': generation_slice,
+        'checkpoint_interval': checkpoint_interval,
+        'wake_radius': wake_radius,
+        'noise_radius': noise_radius,
+        'profile_window': profile_window,
         'colors': colors
     }
 
     return constants
 
 
-def get_game_variables(constants):
-    """Initialize game variables."""
-    # === Entities ===
+def create_player():
+    """Create the player entity (with empty inventory)."""
     fighter_component = Fighter(hp=100, defense=1, power=3)
     inventory_component = Inventory(26)
     level_component = Level()
     equipment_component = Equipment()
     player = Entity(0, 0, '@', libtcod.lightest_grey, 'Player', blocks=True, render_order=RenderOrder.ACTOR,
                     fighter=fighter_component, inventory=inventory_component, level=level_component,
-                    equipment=equipment_component, description='You.')
-    entities = [player]
+                    equipment=equipment_component, description='You.', template='player')
+
+    return player
+
+
+def get_game_variables(constants, seed=None, build_floor=None):
+    """
+    Initialize game variables (the same seed creates the same dungeon).
+
+    build_floor(builder) completes the FloorBuilder of the first floor (see
+    GameSession), by default in one go.
+    """
+    # === Entities ===
+    player = create_player()
+    entities = EntityList([player])
 
     equippable_component = Equippable(**dagger['kwargs'])
     char, color, name = dagger['entity_args']
     starting_weapon = Entity(0, 0, char, color, name, render_order=RenderOrder.ITEM,
-                            equippable=equippable_component, description=dagger['description'])
+                            equippable=equippable_component, description=dagger['description'],
+                            template=dagger['id'])
 
     player.inventory.add_item(starting_weapon)
     player.equipment.toggle_equip(starting_weapon)
 
     # === Game map ===
     game_map = GameMap(constants['map_width'], constants['map_height'],
-                        constants['room_min_size'], constants['room_max_size'])
+                        constants['room_min_size'], constants['room_max_size'], seed=seed)
     dungeon_type = Tunnel
-    game_map.make_map(dungeon_type, player, entities)
+    builder = FloorBuilder(game_map.new_dungeon(game_map.dungeon_level, dungeon_type))
+    (build_floor or FloorBuilder.finish)(builder)
+    game_map.make_map(dungeon_type, player, entities, builder.dungeon)
 
     # === Message log ===
     message_log = MessageLog(constants['message_x'], constants['message_width'], constants['message_height'])
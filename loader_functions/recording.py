@@ -0,0 +1,92 @@
+"""
+Recordings of whole games, for replaying them headless (see replay.py).
+
+A recording starts with a save of the game as it was when recording began
+(save_format, it holds the dungeon seed and the rng state), followed by every
+action passed to GameSession.step in the journal format of autosave. The
+game is deterministic given the actions, so replaying a recording repeats
+the same fights, floors and deaths; the crc32 of the final save confirms it.
+
+Layout (little-endian):
+
+    header      magic b'SPRC', u16 version, u32 size of the start save,
+                start save
+    entry       journal entry (see autosave)
+    end         u8 0, u32 crc32 of the save of the final game (missing if
+                the game crashed)
+"""
+import struct
+import zlib
+
+from loader_functions.autosave import Autosave, encode_ops, rng_check
+from loader_functions.save_format import dump
+
+
+MAGIC = b'SPRC'
+VERSION = 1
+
+
+def save_session(session):
+    """Return save of the session's game."""
+    # Energy is part of the save
+    session.scheduler.settle()
+    return dump(session.player, session.entities, session.game_map, session.message_log, session.game_state)
+
+
+class Recorder:
+    """Writes the actions of a running game to a recording."""
+
+    def __init__(self, path, session):
+        self.file = open(path, 'wb')
+
+        data = save_session(session)
+        self.file.write(MAGIC + struct.pack('<HI', VERSION, len(data)) + data)
+
+    def record(self, session, action, mouse_action):
+        """Append the action that was just passed to session.step."""
+        ops = encode_ops(action, mouse_action)
+        if ops:
+            self.file.write(ops + struct.pack('<I', rng_check(session.game_map)))
+
+    def close(self, session):
+        """Write the end of the recording."""
+        self.file.write(struct.pack('<BI', 0, zlib.crc32(save_session(session))))
+        self.file.close()
+
+
+def read_recording(path):
+    """
+    Return start save, list of (action, mouse_action, rng check) entries and
+    crc32 of the final save (None if the recording has no end).
+    """
+    with open(path, 'rb') as recording_file:
+        data = recording_file.read()
+
+    header_size = len(MAGIC) + struct.calcsize('<HI')
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('not a recording')
+    version, size = struct.unpack_from('<HI', data, len(MAGIC))
+    if version != VERSION:
+        raise ValueError('recording version {0} is not supported'.format(version))
+
+    start = data[header_size:header_size + size]
+    offset = header_size + size
+    entries = []
+    final_crc = None
+
+    while offset < len(data):
+        try:
+            if data[offset] == 0:
+                final_crc, = struct.unpack_from('<I', data, offset + 1)
+                break
+
+            action, mouse_action, offset = Autosave.decode_entry(data, offset)
+            check, = struct.unpack_from('<I', data, offset)
+        except (struct.error, IndexError, KeyError):
+            # Cut off by a crash
+            break
+        offset += 4
+
+        entries.append((action, mouse_action, check))
+
+    return start, entries, final_crc
@@ -0,0 +1,378 @@
+"""
+Binary save game format.
+
+Instead of pickling the whole object graph, a save stores the tile types as
+a byte array, the explored flags as a bitset and every entity as a small
+record that names the template (monster / item id, 'player' or 'stairs') it
+was created from plus the state that changes during play. All numbers are
+little-endian, strings are UTF-8 with a length prefix (u8 for template ids,
+u16 otherwise).
+
+    header      magic b'SPSV', u16 version
+    game        u8 game state, u16 dungeon level, u8 room min size,
+                u8 room max size, string seed, game map rng state
+                (u8 version, 625 x u32, u8 has gauss, f64 gauss)
+    map         u16 width, u16 height, width*height x u8 tile ids
+                (see TILE_NAMES), explored bitset (bit i of byte i//8 is
+                cell i, row-major)
+    messages    u16 x, u16 width, u16 height, rgb of the previous message
+                color, u16 count, count x (rgb, string text)
+    templates   u16 count, count x string template id
+    entities    u16 count, count x entity record
+    map list    u16 count, count x u16 entity index, u16 player index
+
+An entity record is u16 template index, i16 x, i16 y, u8 flags and the
+blocks for the flags that are set, in this order:
+
+    FIGHTER     i32 hp, base max hp, base power, base defense, xp, energy,
+                turn rank (-1 = none yet, see TurnScheduler)
+    AI_EFFECTS  u8 count, count x (u8 kind, u16 turns), outermost first
+                (kind 1 = confused, 2 = frozen)
+    LEVEL       u16 current level, u32 current xp
+    INVENTORY   u8 capacity, u8 count, count x u16 entity index
+    EQUIPMENT   u16 entity index per slot (EQUIPMENT_SLOTS, 0xffff = empty)
+    STAIRS      u16 floor
+    DEAD        no block, the entity is a corpse (monsters lose their
+                fighter, the player keeps it with hp <= 0)
+    AWAKE       no block, the monster is not dormant
+
+Items in inventories and equipment slots are entities of their own, so they
+are referenced by index into the entity records. Cells excluded from
+spawning are not saved (they are only used while generating a floor).
+"""
+import libtcodpy as libtcod
+
+import struct
+
+from components.ai import BasicMonster, ConfusedMonster, FrozenMonster
+from components.equipment import Equipment
+from components.inventory import Inventory
+from death_functions import kill_monster, kill_player
+from entity import EntityList
+from game_messages import Message, MessageLog
+from game_states import GameStates
+from loader_functions.initialize_new_game import create_player
+from map_objects.dungeon_components.tile import TileGrid
+from map_objects.game_map import GameMap
+from map_objects.items import consumables, equipment
+from map_objects.monsters import monsters
+from map_objects.path_map import PathMap
+
+
+MAGIC = b'SPSV'
+VERSION = 4
+
+FIGHTER, AI_EFFECTS, LEVEL, INVENTORY, EQUIPMENT, STAIRS, DEAD, AWAKE = (1 << i for i in range(8))
+
+EQUIPMENT_SLOTS = ('main_hand', 'off_hand', 'torso', 'head', 'coat', 'ring_l', 'ring_r', 'special')
+NO_ENTITY = 0xffff
+
+MONSTER_IDS = {monster['id'] for monster in monsters}
+
+AI_EFFECT_KINDS = {ConfusedMonster: 1, FrozenMonster: 2}
+AI_EFFECT_CLASSES = {kind: cls for cls, kind in AI_EFFECT_KINDS.items()}
+
+
+class SaveWriter:
+    """Collects the packed values of a save."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def pack(self, fmt, *values):
+        self.data += struct.pack('<' + fmt, *values)
+
+    def string(self, text, length_fmt='H'):
+        encoded = text.encode('utf-8')
+        self.pack(length_fmt, len(encoded))
+        self.data += encoded
+
+    def color(self, color):
+        self.pack('3B', color.r, color.g, color.b)
+
+
+class SaveReader:
+    """Reads the values of a save in the order they were written."""
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, fmt):
+        fmt = '<' + fmt
+        size = struct.calcsize(fmt)
+        if self.offset + size > len(self.data):
+            raise ValueError('save game is truncated')
+        values = struct.unpack_from(fmt, self.data, self.offset)
+        self.offset += size
+        return values
+
+    def value(self, fmt):
+        return self.unpack(fmt)[0]
+
+    def read(self, size):
+        data = self.data[self.offset:self.offset + size]
+        if len(data) != size:
+            raise ValueError('save game is truncated')
+        self.offset += size
+        return data
+
+    def string(self, length_fmt='H'):
+        return self.read(self.value(length_fmt)).decode('utf-8')
+
+    def color(self):
+        return libtcod.Color(*self.unpack('3B'))
+
+
+def pack_bits(flags):
+    """Pack a sequence of 0/1 values into bytes (8 per byte, lowest bit first)."""
+    return bytes(sum(flag << bit for bit, flag in enumerate(flags[i:i + 8]))
+                 for i in range(0, len(flags), 8))
+
+
+def unpack_bits(data, count):
+    """Return bytearray of count 0/1 values packed with pack_bits."""
+    return bytearray((byte >> bit) & 1 for byte in data for bit in range(8))[:count]
+
+
+def entity_table(entities):
+    """Return list of all entities: on the map, in inventories and equipment slots."""
+    table = []
+    indices = {}
+
+    def add(entity):
+        if id(entity) in indices:
+            return
+        indices[id(entity)] = len(table)
+        table.append(entity)
+
+        if entity.inventory:
+            for item in entity.inventory.items:
+                add(item)
+        if entity.equipment:
+            for item in entity.equipment.equipped:
+                add(item)
+
+    for entity in entities:
+        add(entity)
+
+    return table, indices
+
+
+def dump(player, entities, game_map, message_log, game_state):
+    """Return the game as bytes in the save format."""
+    writer = SaveWriter()
+    writer.data += MAGIC
+    writer.pack('H', VERSION)
+
+    # === Game ===
+    writer.pack('BHBB', game_state.value, game_map.dungeon_level, game_map.room_min_size, game_map.room_max_size)
+    writer.string(str(game_map.seed))
+    rng_version, rng_internal, gauss_next = game_map.rng.getstate()
+    writer.pack('B625IBd', rng_version, *rng_internal, gauss_next is not None, gauss_next or 0.0)
+
+    # === Map ===
+    tiles = game_map.tiles
+    writer.pack('HH', tiles.width, tiles.height)
+    writer.data += tiles.types
+    writer.data += pack_bits(tiles.explored)
+
+    # === Messages ===
+    writer.pack('HHH', message_log.x, message_log.width, message_log.height)
+    writer.color(message_log.previous_message_color)
+    writer.pack('H', len(message_log.messages))
+    for message in message_log.messages:
+        writer.color(message.color)
+        writer.string(message.text)
+
+    # === Entities ===
+    table, indices = entity_table(entities)
+
+    templates = sorted({entity.template for entity in table if entity.template})
+    if len(templates) != len({entity.template for entity in table}):
+        raise ValueError('can not save entities that were not created from a template')
+    template_indices = {template: i for i, template in enumerate(templates)}
+
+    writer.pack('H', len(templates))
+    for template in templates:
+        writer.string(template, 'B')
+
+    writer.pack('H', len(table))
+    for entity in table:
+        write_entity(writer, entity, template_indices, indices)
+
+    writer.pack('H', len(entities))
+    for entity in entities:
+        writer.pack('H', indices[id(entity)])
+    writer.pack('H', indices[id(player)])
+
+    return bytes(writer.data)
+
+
+def write_entity(writer, entity, template_indices, indices):
+    """Write the record of an entity."""
+    effects = []
+    ai = entity.ai
+    while type(ai) in AI_EFFECT_KINDS:
+        effects.append((AI_EFFECT_KINDS[type(ai)], ai.number_of_turns))
+        ai = ai.previous_ai
+
+    flags = 0
+    if entity.fighter:
+        flags |= FIGHTER
+    if effects:
+        flags |= AI_EFFECTS
+    if entity.level:
+        flags |= LEVEL
+    if entity.inventory:
+        flags |= INVENTORY
+    if entity.equipment:
+        flags |= EQUIPMENT
+    if entity.stairs:
+        flags |= STAIRS
+    if entity.fighter.hp <= 0 if entity.fighter else entity.template in MONSTER_IDS:
+        flags |= DEAD
+    if isinstance(ai, BasicMonster) and ai.awake:
+        flags |= AWAKE
+
+    writer.pack('HhhB', template_indices[entity.template], entity.x, entity.y, flags)
+
+    if flags & FIGHTER:
+        fighter = entity.fighter
+        writer.pack('7i', fighter.hp, fighter.base_max_hp, fighter.base_power, fighter.base_defense,
+                    fighter.xp, fighter.energy, -1 if fighter.rank is None else fighter.rank)
+    if flags & AI_EFFECTS:
+        writer.pack('B', len(effects))
+        for kind, turns in effects:
+            writer.pack('BH', kind, turns)
+    if flags & LEVEL:
+        writer.pack('HI', entity.level.current_level, entity.level.current_xp)
+    if flags & INVENTORY:
+        items = entity.inventory.items
+        writer.pack('BB', entity.inventory.capacity, len(items))
+        writer.pack('{0}H'.format(len(items)), *(indices[id(item)] for item in items))
+    if flags & EQUIPMENT:
+        slots = (getattr(entity.equipment, slot) for slot in EQUIPMENT_SLOTS)
+        writer.pack('8H', *(indices[id(item)] if item else NO_ENTITY for item in slots))
+    if flags & STAIRS:
+        writer.pack('H', entity.stairs.floor)
+
+
+def load(data):
+    """Return (player, entities, game_map, message_log, game_state) from a save."""
+    reader = SaveReader(data)
+    if reader.read(len(MAGIC)) != MAGIC:
+        raise ValueError('not a save game')
+    version = reader.value('H')
+    if version != VERSION:
+        raise ValueError('unsupported save game version {0}'.format(version))
+
+    # === Game ===
+    game_state_value, dungeon_level, room_min_size, room_max_size = reader.unpack('BHBB')
+    game_state = GameStates(game_state_value)
+    seed = int(reader.string())
+    rng_state = reader.unpack('B625IBd')
+
+    # === Map ===
+    width, height = reader.unpack('HH')
+    game_map = GameMap(width, height, room_min_size, room_max_size, dungeon_level, seed)
+    game_map.rng.setstate((rng_state[0], rng_state[1:626], rng_state[627] if rng_state[626] else None))
+
+    tiles = TileGrid(width, height)
+    tiles.types[:] = reader.read(width * height)
+    tiles.explored[:] = unpack_bits(reader.read((width * height + 7) // 8), width * height)
+    game_map.tiles = tiles
+    game_map.path_map = PathMap(tiles)
+
+    # === Messages ===
+    message_log = MessageLog(*reader.unpack('HHH'))
+    message_log.previous_message_color = reader.color()
+    for i in range(reader.value('H')):
+        color = reader.color()
+        message_log.messages.append(Message(reader.string(), color))
+
+    # === Entities ===
+    templates = [reader.string('B') for i in range(reader.value('H'))]
+    records = [read_entity(reader, templates, game_map) for i in range(reader.value('H'))]
+    table = [entity for entity, links in records]
+
+    # Inventories and equipment refer to other entities, link them once all exist
+    for entity, (inventory, slots) in records:
+        if inventory is not None:
+            entity.inventory.items = [table[i] for i in inventory]
+        if slots is not None:
+            for slot, i in zip(EQUIPMENT_SLOTS, slots):
+                setattr(entity.equipment, slot, table[i] if i != NO_ENTITY else None)
+
+    entities = EntityList(table[i] for i in reader.unpack('{0}H'.format(reader.value('H'))))
+    player = table[reader.value('H')]
+
+    return player, entities, game_map, message_log, game_state
+
+
+def create_from_template(template, game_map):
+    """Create an entity as it was when it was spawned from its template."""
+    if template == 'player':
+        return create_player()
+    if template == 'stairs':
+        return game_map.create_stairs_entity(0, 0)
+
+    for monster in monsters:
+        if monster['id'] == template:
+            # Equipment is saved as separate entities
+            return game_map.create_monster_entity(0, 0, monster)
+    for consumable in consumables:
+        if consumable['id'] == template:
+            return game_map.create_item_entity(0, 0, consumable)
+    for equippable in equipment:
+        if equippable['id'] == template:
+            return game_map.create_item_entity(0, 0, equippable, is_equippable=True)
+
+    raise ValueError('unknown entity template {0}'.format(template))
+
+
+def read_entity(reader, templates, game_map):
+    """
+    Read an entity record. Return the entity and its links to other entities
+    (inventory and equipment indices, None if it has none).
+    """
+    template_index, x, y, flags = reader.unpack('HhhB')
+    entity = create_from_template(templates[template_index], game_map)
+    entity.x, entity.y = x, y
+    inventory = slots = None
+
+    if flags & FIGHTER:
+        fighter = entity.fighter
+        fighter.hp, fighter.base_max_hp, fighter.base_power, fighter.base_defense, fighter.xp, fighter.energy, \
+            rank = reader.unpack('7i')
+        fighter.rank = None if rank == -1 else rank
+    if flags & AWAKE:
+        entity.ai.awake = True
+    if flags & AI_EFFECTS:
+        effects = [reader.unpack('BH') for i in range(reader.value('B'))]
+        # Wrap the template's ai, innermost effect first
+        for kind, turns in reversed(effects):
+            effect = AI_EFFECT_CLASSES[kind](entity.ai, turns)
+            effect.owner = entity
+            entity.ai = effect
+    if flags & LEVEL:
+        entity.level.current_level, entity.level.current_xp = reader.unpack('HI')
+    if flags & INVENTORY:
+        capacity, count = reader.unpack('BB')
+        entity.inventory = Inventory(capacity)
+        entity.inventory.owner = entity
+        inventory = reader.unpack('{0}H'.format(count))
+    if flags & EQUIPMENT:
+        if not entity.equipment:
+            entity.equipment = Equipment()
+            entity.equipment.owner = entity
+        slots = reader.unpack('8H')
+    if flags & STAIRS:
+        entity.stairs.floor = reader.value('H')
+    if flags & DEAD:
+        if entity.template == 'player':
+            kill_player(entity)
+        else:
+            kill_monster(entity)
+
+    return entity, (inventory, slots)
@@ -1,5 +1,3 @@
-import random as rd
-
 from map_objects.dungeon_components.rect import Rect
 
 
@@ -7,7 +5,8 @@ class Node:
     """
     Node in BSP Tree.
     """
-    def __init__(self, x, y, width, height):
+    def __init__(self, x, y, width, height, rng):
+        self.rng = rng
         self.x = x
         self.y = y
         self.width = width
@@ -38,7 +37,7 @@ class Node:
         elif (self.height / self.width) >= 1.25:
             split_horizontally = True
         else:
-            split_horizontally = rd.choice([True, False])
+            split_horizontally = self.rng.choice([True, False])
 
         if split_horizontally:
             max_length = self.height - self.min_leaf_size
@@ -48,14 +47,14 @@ class Node:
         if max_length <= self.min_leaf_size:
             return False  # Node is too small to split further
 
-        split = rd.randint(self.min_leaf_size, max_length)
+        split = self.rng.randint(self.min_leaf_size, max_length)
 
         if split_horizontally:
-            self.child_1 = Node(self.x, self.y, self.width, split)
-            self.child_2 = Node(self.x, self.y + split, self.width, self.height-split)
+            self.child_1 = Node(self.x, self.y, self.width, split, self.rng)
+            self.child_2 = Node(self.x, self.y + split, self.width, self.height-split, self.rng)
         else:
-            self.child_1 = Node(self.x, self.y, split, self.height)
-            self.child_2 = Node(self.x + split, self.y, self.width-split, self.height)
+            self.child_1 = Node(self.x, self.y, split, self.height, self.rng)
+            self.child_2 = Node(self.x + split, self.y, self.width-split, self.height, self.rng)
 
         return True
 
@@ -71,10 +70,10 @@ class Node:
 
         else:
             # Create rooms in the end branches of the bsp tree
-            w = rd.randint(room_min_size, min(room_max_size, self.width-1))
-            h = rd.randint(room_min_size, min(room_max_size, self.height-1))
-            x = rd.randint(self.x, self.x+(self.width-1)-w)
-            y = rd.randint(self.y, self.y+(self.height-1)-h)
+            w = self.rng.randint(room_min_size, min(room_max_size, self.width-1))
+            h = self.rng.randint(room_min_size, min(room_max_size, self.height-1))
+            x = self.rng.randint(self.x, self.x+(self.width-1)-w)
+            y = self.rng.randint(self.y, self.y+(self.height-1)-h)
 
             self.room = Rect(x, y, w, h)
             bsp_tree.create_room(self.room)
@@ -104,7 +103,7 @@ class Node:
                 # room_2 and !room_1
                 return self.room_2
             # If both rooms exist, pick one
-            elif rd.random() < 0.5:
+            elif self.rng.random() < 0.5:
                 return self.room_1
             else:
                 return self.room_2
@@ -4,31 +4,121 @@ import json
 with open("map_objects/dungeon_components/tiles.json") as tile_data:
     TILE_TYPES = json.load(tile_data)
 
+# Tile types are stored as small integer ids, properties are looked up per id
+TILE_NAMES = tuple(TILE_TYPES)
+TILE_IDS = {name: i for i, name in enumerate(TILE_NAMES)}
 
-class Tile:
+
+def _flag_table(prop):
+    """
+    Build a 256 byte translation table that maps a tile id to 1 if the
+    tile type has the property, otherwise 0 (used with bytes.translate).
+    """
+    table = bytearray(256)
+    for tile_id, name in enumerate(TILE_NAMES):
+        table[tile_id] = bool(TILE_TYPES[name].get(prop))
+    return bytes(table)
+
+
+BLOCKED = _flag_table("blocked")
+BLOCK_SIGHT = _flag_table("block_sight")
+CAN_SPAWN = _flag_table("can_spawn")
+
+# Extra time it takes to step off a tile, as fraction of an action (see turn_scheduler)
+MOVEMENT_MOD = tuple(TILE_TYPES[name].get("movement_mod") for name in TILE_NAMES)
+CHARACTER = tuple(TILE_TYPES[name]["character"] for name in TILE_NAMES)
+COLORS_DARK = tuple((tuple(TILE_TYPES[name]["colors_dark"]["fg"]), tuple(TILE_TYPES[name]["colors_dark"]["bg"]))
+                    for name in TILE_NAMES)
+COLORS_LIT = tuple((tuple(TILE_TYPES[name]["colors_lit"]["fg"]), tuple(TILE_TYPES[name]["colors_lit"]["bg"]))
+                    for name in TILE_NAMES)
+
+
+class TileGrid:
     """
-    A tile on a map.
+    The tiles of a map.
 
-    It may or may not be blocked, and may or may not block sight.
-    Some tiles prevent spawning.
+    Every cell stores the id of its tile type in a flat (row-major) bytearray,
+    whether a tile is blocked, blocks sight, etc. is looked up in the tables
+    of its type. Cells can additionally be excluded from spawning and are
+    flagged once they have been explored.
     """
-    def __init__(self, tile_type="wall"):
-        self._set_type(tile_type)
-        self.explored = True
-
-    def carve(self):
-        self._set_type("ground")
-
-    def block(self):
-        self._set_type("wall")
-
-    def _set_type(self, tile_type):
-        self.tile_type = tile_type
-        self.blocked = TILE_TYPES[tile_type]["blocked"]
-        self.block_sight = TILE_TYPES[tile_type]["block_sight"]
-        self.can_spawn = TILE_TYPES[tile_type]["can_spawn"]
-        self.movement_mod = TILE_TYPES[tile_type]["movement_mod"]
-
-        self.character = TILE_TYPES[tile_type]["character"]
-        self.colors_dark = TILE_TYPES[tile_type]["colors_dark"]
-        self.colors_lit = TILE_TYPES[tile_type]["colors_lit"]
+    def __init__(self, width, height, tile_type="wall", explored=True):
+        self.width = width
+        self.height = height
+        size = width * height
+        self.types = bytearray([TILE_IDS[tile_type]]) * size
+        self.explored = bytearray([explored]) * size
+        self.no_spawn = bytearray(size)
+
+    def index(self, x, y):
+        """Return position of the cell at (x, y) in the flat arrays."""
+        return y * self.width + x
+
+    def coordinates(self, index):
+        """Return (x, y) of the cell at index."""
+        return index % self.width, index // self.width
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def tile_type(self, x, y):
+        return TILE_NAMES[self.types[y * self.width + x]]
+
+    def set_type(self, x, y, tile_type):
+        self.types[y * self.width + x] = TILE_IDS[tile_type]
+
+    def carve(self, x, y):
+        self.types[y * self.width + x] = TILE_IDS["ground"]
+
+    def block(self, x, y):
+        self.types[y * self.width + x] = TILE_IDS["wall"]
+
+    def is_blocked(self, x, y):
+        return BLOCKED[self.types[y * self.width + x]] == 1
+
+    def blocks_sight(self, x, y):
+        return BLOCK_SIGHT[self.types[y * self.width + x]] == 1
+
+    def can_spawn(self, x, y):
+        i = y * self.width + x
+        return CAN_SPAWN[self.types[i]] == 1 and not self.no_spawn[i]
+
+    def exclude_from_spawning(self, x, y):
+        self.no_spawn[y * self.width + x] = 1
+
+    def movement_mod(self, x, y):
+        return MOVEMENT_MOD[self.types[y * self.width + x]]
+
+    def character(self, x, y):
+        return CHARACTER[self.types[y * self.width + x]]
+
+    def colors(self, x, y, lit):
+        """Return (fg, bg) color tuples of the tile, depending on its lighting."""
+        if lit:
+            return COLORS_LIT[self.types[y * self.width + x]]
+        return COLORS_DARK[self.types[y * self.width + x]]
+
+    def is_explored(self, x, y):
+        return self.explored[y * self.width + x] == 1
+
+    def set_explored(self, x, y):
+        self.explored[y * self.width + x] = 1
+
+    # === Map-wide masks (one byte per cell, 1 = property applies) ===
+    def blocked_mask(self):
+        return self.types.translate(BLOCKED)
+
+    def block_sight_mask(self):
+        return self.types.translate(BLOCK_SIGHT)
+
+    def spawn_mask(self):
+        """Cells that can be spawned on (tile type allows it and not excluded)."""
+        mask = self.types.translate(CAN_SPAWN)
+        if any(self.no_spawn):
+            mask = bytes(m and not n for m, n in zip(mask, self.no_spawn))
+        return mask
+
+    def cells(self, mask):
+        """Return list of (x, y) coordinates of all cells set in mask."""
+        width = self.width
+        return [(i % width, i // width) for i, flag in enumerate(mask) if flag]
@@ -1,5 +1,3 @@
-import random as rd
-
 from map_objects.dungeon_components.node import Node
 from map_objects.dungeon_generation.dun_gen import DunGen
 from map_objects.dungeon_helper import Rectangular
@@ -10,21 +8,21 @@ class BSPTree(DunGen, Rectangular):
     Recursively divide the area of the dungeon into sub areas and
     create rooms within them.
     """
-    def __init__(self, width, height, room_min_size, room_max_size):
-        super().__init__(width, height)
+    def __init__(self, width, height, room_min_size, room_max_size, rng=None):
+        super().__init__(width, height, rng=rng)
         self.room_min_size = room_min_size
         self.room_max_size = room_max_size
         self._nodes = []
         self.max_node_size = 24
         self.rooms = []
 
-    def create_dungeon(self):
+    def steps(self):
         """
         Create root node of the tree and split recursively until nodes can no
         longer split. Carve out rooms in node areas and connect.
         Stairs are placed in the last room.
         """
-        root_node = Node(0, 0, self.width, self.height)
+        root_node = Node(0, 0, self.width, self.height, self.rng)
         self._nodes.append(root_node)
 
         split_successfully = True
@@ -35,11 +33,15 @@ class BSPTree(DunGen, Rectangular):
                 if n.child_1 is None and n.child_2 is None:
                     try_split = any([n.width > self.max_node_size,
                                     n.height > self.max_node_size,
-                                    rd.random() > 0.8])
+                                    self.rng.random() > 0.8])
                     if try_split:
                         if n.split():
                             self._nodes.append(n.child_1)
                             self._nodes.append(n.child_2)
                             split_successfully = True
+            yield 0.5
 
         root_node.create_rooms(self, self.room_min_size, self.room_max_size)
+        for progress in self.remove_unreachable():
+            yield 0.5 + 0.5 * progress
+        yield 1.0
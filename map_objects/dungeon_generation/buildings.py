@@ -1,13 +1,11 @@
-import random as rd
-
 from map_objects.dungeon_components.rect import Rect
-from map_objects.dungeon_components.tile import Tile
+from map_objects.dungeon_components.tile import TileGrid
 from map_objects.dungeon_generation.dun_gen import DunGen
 
 
 class Buildings(DunGen):
-    def __init__(self, width, height, room_min_size, room_max_size):
-        super().__init__(width, height)
+    def __init__(self, width, height, room_min_size, room_max_size, rng=None):
+        super().__init__(width, height, rng=rng)
         self.tiles = self.initialize_tiles()
         self.room_min_size = room_min_size
         self.room_max_size = room_max_size
@@ -17,16 +15,16 @@ class Buildings(DunGen):
 
     def initialize_tiles(self):
         """Fill game map with clear tiles."""
-        return [[Tile(False) for y in range(self.height)] for x in range(self.width)]
+        return TileGrid(self.width, self.height, "ground")
 
-    def create_dungeon(self):
+    def steps(self):
         for r in range(self.max_rooms):
             # Random width and height
-            w = rd.randint(self.room_min_size, self.room_max_size)
-            h = rd.randint(self.room_min_size, self.room_max_size)
+            w = self.rng.randint(self.room_min_size, self.room_max_size)
+            h = self.rng.randint(self.room_min_size, self.room_max_size)
             # Random position without going out of the boundaries of the map
-            x = rd.randint(0, self.width-w-1)
-            y = rd.randint(0, self.height-h-1)
+            x = self.rng.randint(0, self.width-w-1)
+            y = self.rng.randint(0, self.height-h-1)
 
             new_room = Rect(x, y, w, h)
 
@@ -45,17 +43,23 @@ class Buildings(DunGen):
                 # Append the new room to the list
                 self.rooms.append(new_room)
 
+            yield 0.9 * (r + 1) / self.max_rooms
+
+        for progress in self.remove_unreachable():
+            yield 0.9 + 0.1 * progress
+        yield 1.0
+
     def create_room_walls(self, room):
         """Block tiles along the borders of the rectangle and create door."""
         wall_tiles = []
         for y in (room.y1, room.y2):
             for x in range(room.x1, room.x2+1):
-                self.tiles[x][y].block()
+                self.tiles.block(x, y)
                 wall_tiles.append((x, y))
 
         for x in (room.x1, room.x2):
             for y in range(room.y1, room.y2+1):
-                self.tiles[x][y].block()
+                self.tiles.block(x, y)
                 wall_tiles.append((x, y))
 
         # Prevent doorway in corners or too close to the edge
@@ -67,10 +71,10 @@ class Buildings(DunGen):
             elif wt[1] in (room.y1, room.y2):
                 if room.x1+1 < wt[0] < room.x2-1:
                     door_locs.append(wt)
-        doorway = rd.choice(door_locs)
-        self.tiles[doorway[0]][doorway[1]].carve()
+        doorway = self.rng.choice(door_locs)
+        self.tiles.carve(doorway[0], doorway[1])
 
     def exclude_from_spawning(self, room):
         for x in range(room.x1, room.x2+1):
             for y in range(room.y1, room.y2+1):
-                self.tiles[x][y].can_spawn = False
+                self.tiles.exclude_from_spawning(x, y)
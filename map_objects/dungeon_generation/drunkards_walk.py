@@ -1,6 +1,3 @@
-from random import choices, randint, random
-
-from map_objects.dungeon_components.rect import Rect
 from map_objects.dungeon_generation.dun_gen import DunGen
 
 
@@ -8,8 +5,8 @@ class DrunkardsWalk(DunGen):
     """
     Move randomly to carve out a cave like area.
     """
-    def __init__(self, width, height):
-        super().__init__(width, height)
+    def __init__(self, width, height, rng=None):
+        super().__init__(width, height, rng=rng)
         self._percent_goal = 0.4
         self.walk_iterations = 25000  # Cut off in case _percent_goal is never reached
         self.weighted_toward_center = 0.15
@@ -17,38 +14,36 @@ class DrunkardsWalk(DunGen):
         self.zones = []
 
     def scan_for_zones(self):
-        sections = []
         # divide map into min_room_size sized rectangles and check if they fit
         # in the dungeon layout
         w = h = 3
 
-        for x in range(0, self.width-w-1, w):
-            for y in range(0, self.height-h-1, h):
-                sections.append(Rect(x, y, w, h))
-
-        for s in sections:
-            section_tiles = [(x, y) for x in range(s.x1, s.x2) for y in range(s.y1, s.y2)]
-            if all([st in self.spawn_locations for st in section_tiles]):
-                # 50% chance to make zone eligible for spawning
-                if random() >= 0.5:
-                    self.zones.append(s)
+        for s in self.spawn_zones(w, h, step=w):
+            # 50% chance to make zone eligible for spawning
+            if self.rng.random() >= 0.5:
+                self.zones.append(s)
 
-    def create_dungeon(self):
+    def steps(self):
         """Walk until either goal or maximum iterations have been reached."""
         self.walk_iterations = max(self.walk_iterations, (self.width * self.height * 10))
         self._tiles_filled = 0
         self._prev_direction = None
 
-        self.drunkard_x = randint(2, self.width - 2)
-        self.drunkard_y = randint(2, self.height - 2)
+        self.drunkard_x = self.rng.randint(2, self.width - 2)
+        self.drunkard_y = self.rng.randint(2, self.height - 2)
         self.tiles_goal = self.width * self.height * self._percent_goal
 
         for i in range(self.walk_iterations):
             self.walk()
             if self._tiles_filled >= self.tiles_goal:
                 break
+            if i % 256 == 0:
+                yield 0.9 * self._tiles_filled / self.tiles_goal
 
+        for progress in self.remove_unreachable():
+            yield 0.9 + 0.1 * progress
         self.scan_for_zones()
+        yield 1.0
 
     def walk(self):
         """
@@ -87,7 +82,7 @@ class DrunkardsWalk(DunGen):
         weights = [south, north, east, west]
         moves = {"south": (0, 1), "north": (0, -1), "east": (1, 0), "west": (-1, 0)}
 
-        direction = choices(list(moves.keys()), weights)[0]
+        direction = self.rng.choices(list(moves.keys()), weights)[0]
         dx, dy = moves[direction]
 
         # === Walk ===
@@ -95,7 +90,6 @@ class DrunkardsWalk(DunGen):
         if (1 < self.drunkard_x + dx < self.width - 1) and (1 < self.drunkard_y + dy < self.height - 1):
             self.drunkard_x += dx
             self.drunkard_y += dy
-            if self.tiles[self.drunkard_x][self.drunkard_y]:
-                self.tiles[self.drunkard_x][self.drunkard_y].carve()
-                self._tiles_filled += 1
+            self.tiles.carve(self.drunkard_x, self.drunkard_y)
+            self._tiles_filled += 1
             self._prev_direction = direction
@@ -1,28 +1,80 @@
-from map_objects.dungeon_components.tile import Tile
-from map_objects.dungeon_helper import noise_2d
+import math
+import random
+
+from map_objects.dungeon_components.tile import TILE_IDS, TileGrid
+from map_objects.dungeon_helper import clear_sections, noise_2d
+from map_objects.regions import label_steps
 
 
 class DunGen:
-    """Base class for dungeon generation algorithms."""
-    def __init__(self, width, height, noise=False):
+    """
+    Base class for dungeon generation algorithms.
+
+    All random decisions are made with rng (a random.Random instance), so the
+    same seed always produces the same dungeon.
+
+    Every generator implements steps(): a generator that builds the dungeon
+    step by step and yields the progress (0 to 1) after every step, so the
+    work can be spread over several frames (see FloorBuilder).
+    """
+    def __init__(self, width, height, noise=False, rng=None):
         self.width = width
         self.height = height
+        self.rng = rng or random.Random()
         self.tiles = self.initialize_tiles()
 
         if noise:
-            self.noise_map = noise_2d(width, height)
+            self.noise_map = noise_2d(width, height, self.rng)
 
     def initialize_tiles(self):
         """Fill game map with blocked tiles."""
-        return [[Tile() for y in range(self.height)] for x in range(self.width)]
+        return TileGrid(self.width, self.height)
+
+    def create_dungeon(self):
+        """Generate the whole dungeon in one go."""
+        for progress in self.steps():
+            pass
 
     @property
     def spawn_locations(self):
-        return [(x, y) for x in range(self.width) for y in range(self.height) if self.tiles[x][y].can_spawn]
-
-    def apply_noise(self, tile_type):
-        for x in range(self.width):
-            for y in range(self.height):
-                n = self.noise_map[(x, y)]
-                if abs(n) > 75 and (x, y) in self.spawn_locations:
-                    self.tiles[x][y]._set_type(tile_type)
+        return self.tiles.cells(self.tiles.spawn_mask())
+
+    def spawn_zones(self, w, h, step=1):
+        """Return all w*h sections of the map in which every tile can be spawned on."""
+        return clear_sections(self.tiles.spawn_mask(), self.width, self.height, w, h, step)
+
+    def remove_unreachable(self):
+        """
+        Fill the open tiles that cannot be reached from the largest region
+        with walls (e.g. a building whose door leads off the map), so the
+        player can reach every part of the floor.
+
+        Generator that yields the progress (0 to 1), like steps.
+        """
+        regions = yield from label_steps(self.tiles)
+        if len(regions.sizes) <= 1:
+            return
+
+        largest = regions.largest
+        for index, region in enumerate(regions.labels):
+            if region not in (-1, largest):
+                self.tiles.block(*self.tiles.coordinates(index))
+
+    def apply_noise(self, layers):
+        """
+        Cover spawnable tiles with terrain where the noise is strong.
+
+        layers is a list of (tile_type, threshold): a tile gets the type of the
+        layer with the highest threshold its noise strength (0-100) exceeds.
+        """
+        # Tile id for every noise strength, KEEP leaves the tile as it is
+        KEEP = 255
+        by_strength = bytearray([KEEP]) * 101
+        for tile_type, threshold in sorted(layers, key=lambda layer: layer[1]):
+            by_strength[threshold + 1:] = bytes([TILE_IDS[tile_type]]) * (100 - threshold)
+
+        terrain = bytes(by_strength[math.ceil(abs(n))] for n in self.noise_map)
+        spawn = self.tiles.spawn_mask()
+        types = self.tiles.types
+        types[:] = bytes(new if can_spawn and new != KEEP else old
+                         for old, new, can_spawn in zip(types, terrain, spawn))
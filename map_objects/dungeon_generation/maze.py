@@ -1,4 +1,4 @@
-import random as rd
+from collections import deque
 
 from map_objects.dungeon_components.rect import Rect
 from map_objects.dungeon_generation.dun_gen import DunGen
@@ -37,8 +37,8 @@ class Maze(DunGen):
     north, south, east, west = (0, -1), (0, 1), (1, 0), (-1, 0)
     DIRECTIONS = [north, south, east, west]
 
-    def __init__(self, width, height, room_min_size, room_max_size):
-        super().__init__(width, height)
+    def __init__(self, width, height, room_min_size, room_max_size, rng=None):
+        super().__init__(width, height, rng=rng)
         self._regions = self._initialize_regions()
 
         self.rooms = []
@@ -70,26 +70,46 @@ class Maze(DunGen):
 
         return [[None for y in range(self.mz_height)] for x in range(self.mz_width)]
 
-    def create_dungeon(self):
-        self.add_rooms()
+    def steps(self):
+        # The phases are generators too, their progress is scaled by their
+        # share of the generation time
+        for progress in self.add_rooms():
+            yield 0.02 * progress
 
-        # Fill in the empty space around the rooms with mazes
+        # Fill in the empty space around the rooms with mazes. About half of
+        # the tiles are open when it is filled.
+        open_tiles = sum((room.x2 - room.x1) * (room.y2 - room.y1) for room in self.rooms)
+        expected = self.mz_width * self.mz_height / 2
         for y in range(1, self.mz_height, 2):
             for x in range(1, self.mz_width, 2):
-                if not self.tiles[x][y].blocked:
+                if not self.tiles.is_blocked(x, y):
                     continue
                 start = (x, y)
-                self.grow_maze(start)
+                for carved in self.grow_maze(start):
+                    yield 0.02 + 0.4 * min(1, (open_tiles + carved) / expected)
+                open_tiles += carved
 
-        self.connect_regions()
+        for progress in self.connect_regions():
+            yield 0.42 + 0.15 * progress
 
         if not self.allow_dead_ends:
-            self.remove_dead_ends()
+            for progress in self.remove_dead_ends():
+                yield 0.57 + 0.43 * progress
+
+        for progress in self.remove_unreachable():
+            yield 0.9 + 0.1 * progress
+        yield 1.0
 
     def grow_maze(self, start):
-        """Grow maze from <start> (randomized flood fill)."""
+        """
+        Grow maze from <start> (randomized flood fill).
+
+        Yields the number of tiles carved so far every few hundred tiles, and
+        once more at the end.
+        """
         cells = []
         last_direction = None
+        carved = 1
 
         self.start_region()
         self.carve_cell(start[0], start[1])
@@ -108,7 +128,7 @@ class Maze(DunGen):
             if len(unmade_cells):
                 # Based on how "windy" passages are, try to prefer carving in
                 # the same direction
-                if (last_direction in unmade_cells) and (rd.random() > self.winding_percent):
+                if (last_direction in unmade_cells) and (self.rng.random() > self.winding_percent):
                     direction = last_direction
                 else:
                     direction = unmade_cells.pop()
@@ -124,11 +144,17 @@ class Maze(DunGen):
                 cells.append(new_cell)
                 last_direction = direction
 
+                carved += 2
+                if carved % 256 == 1:
+                    yield carved
+
             else:
                 # No adjacent uncarved cells
                 del cells[-1]
                 last_direction = None
 
+        yield carved
+
     def add_rooms(self):
         """
         Pick random room size and random location.
@@ -137,10 +163,10 @@ class Maze(DunGen):
         prevent them from being to narrow or flat.
         """
         for i in range(self.build_room_attempts):
-            w = rd.randint(self.room_min_size//2, self.room_max_size//2) * 2 + 1
-            h = rd.randint(self.room_min_size//2, self.room_max_size//2) * 2 + 1
-            x = (rd.randint(0, self.mz_width-w-1)//2) * 2 + 1
-            y = (rd.randint(0, self.mz_height-h-1)//2) * 2 + 1
+            w = self.rng.randint(self.room_min_size//2, self.room_max_size//2) * 2 + 1
+            h = self.rng.randint(self.room_min_size//2, self.room_max_size//2) * 2 + 1
+            x = (self.rng.randint(0, self.mz_width-w-1)//2) * 2 + 1
+            y = (self.rng.randint(0, self.mz_height-h-1)//2) * 2 + 1
 
             new_room = Rect(x, y, w, h)
 
@@ -153,15 +179,22 @@ class Maze(DunGen):
                 self.start_region()
                 self.create_room(new_room)
 
+            yield (i + 1) / self.build_room_attempts
+
     def connect_regions(self):
-        """Find all the tiles that can connect two (or more) regions."""
-        # Find all of the tiles that can connect two regions
-        connector_regions = [[None for y in range(self.mz_height)]
-                            for x in range(self.mz_width)]
+        """
+        Open connectors (wall tiles that touch two or more regions) until all
+        regions are joined. Yields the progress (0 to 1) now and then.
 
-        for x in range(1, self.mz_width-1):
-            for y in range(1, self.mz_height-1):
-                if not self.tiles[x][y].blocked:
+        Joined regions are tracked with a union-find. The connectors between
+        every two (joined) regions are kept in one bucket, so when two regions
+        are joined all connectors between them are found without a rescan.
+        """
+        # Find all of the tiles that can connect two regions
+        connector_regions = {}
+        for y in range(1, self.mz_height-1):
+            for x in range(1, self.mz_width-1):
+                if not self.tiles.is_blocked(x, y):
                     continue
 
                 # Count the number of different regions the wall tile is touching
@@ -175,83 +208,106 @@ class Maze(DunGen):
 
                 # Tile must connect to least two regions
                 if len(regions) >= 2:
-                    connector_regions[x][y] = regions
-
-        # Make a list of all the connectors
-        connectors = set()
-        for x in range(0, self.mz_width):
-            for y in range(0, self.mz_height):
-                if connector_regions[x][y]:
-                    connector_position = (x, y)
-                    connectors.add(connector_position)
-
-        # Keep track of which regions have been merged. This maps an original
-        # region index to the one it has been merged to.
-        merged = {}
-        open_regions = set()
-        for i in range(self._current_region+1):
-            merged[i] = i
-            open_regions.add(i)
+                    connector_regions[(x, y)] = sorted(regions)
+
+            yield 0.5 * y / self.mz_height
+
+        region_count = self._current_region + 1
+        self._region_parent = list(range(region_count))
+        # _region_connectors[a][b] is the bucket of connectors between a and b
+        # (the same list is stored as [b][a])
+        self._region_connectors = [{} for i in range(region_count)]
+        for connector, regions in connector_regions.items():
+            first = regions[0]
+            for other in regions[1:]:
+                bucket = self._region_connectors[first].get(other)
+                if bucket is None:
+                    bucket = self._region_connectors[first][other] = self._region_connectors[other][first] = []
+                bucket.append(connector)
+
+        # Connectors that may still be opened. Going through them in random
+        # order is the same as repeatedly choosing a random one.
+        connectors = set(connector_regions)
+        order = list(connector_regions)
+        self.rng.shuffle(order)
 
         # Connect the regions until one is left
-        while len(open_regions) > 1:
-            connector = rd.choice(tuple(connectors))  # Get random connector
+        open_regions = region_count
+        for i, connector in enumerate(order):
+            if open_regions <= 1:
+                break
+            if i % 256 == 0:
+                yield 0.5 + 0.5 * i / len(order)
+            if connector not in connectors:
+                continue
 
             # Carve the connection
             self.add_junction(connector)
 
-            # merge the connected regions
-            x = connector[0]
-            y = connector[1]
-
-            # make a list of the regions at (x,y)
-            regions = []
-            for n in connector_regions[x][y]:
-                # get the regions in the form of merged[n]
-                actual_region = merged[n]
-                regions.append(actual_region)
-
-            dest = regions[0]
-            sources = regions[1:]
-
-            # Merge all of the affected regions. We have to look at ALL of the
-            # regions because other regions may have been previously merged
-            # with some of the ones we're merging now.
-            for i in range(self._current_region+1):
-                if merged[i] in sources:
-                    merged[i] = dest
-
-            # Clear the sources, they are no longer needed
-            for source in sources:
-                open_regions.remove(source)
-
-            # Remove the unneeded connectors
-            connectors_to_remove = set()
-            for pos in connectors:
-                # Remove connectors that are next to the current connector
-                if self.distance(connector, pos) < 2:
-                    connectors_to_remove.add(pos)
-                    continue
-
-                # Check if the connector still spans different regions
-                regions = set()
-                x = pos[0]
-                y = pos[1]
-                for n in connector_regions[x][y]:
-                    actual_region = merged[n]
-                    regions.add(actual_region)
-                if len(regions) > 1:
-                    continue
-
-                # This connector isn't needed, but connect it occaisonally so
-                # that the dungeon isn't singly-connected
-                if rd.random() < self.extra_connector_chance:
-                    self.add_junction(pos)
+            # Remove the connectors that are next to the current connector
+            x, y = connector
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    connectors.discard((x+dx, y+dy))
+
+            # Merge the connected regions
+            roots = sorted({self._find_region(region) for region in connector_regions[connector]})
+            dest = roots[0]
+            for source in roots[1:]:
+                dest, redundant = self._merge_regions(dest, source)
+                open_regions -= 1
+
+                for pos in redundant:
+                    if pos not in connectors:
+                        continue
+
+                    # This connector isn't needed, but connect it occaisonally so
+                    # that the dungeon isn't singly-connected
+                    if self.rng.random() < self.extra_connector_chance:
+                        self.add_junction(pos)
+
+                    connectors.discard(pos)
+
+        del self._region_parent, self._region_connectors
+
+    def _find_region(self, region):
+        """Return the region that <region> has been merged into."""
+        parent = self._region_parent
+        while parent[region] != region:
+            # Path halving
+            parent[region] = parent[parent[region]]
+            region = parent[region]
+        return region
+
+    def _merge_regions(self, a, b):
+        """
+        Merge the (root) regions a and b.
 
-                if len(regions) == 1:
-                    connectors_to_remove.add(pos)
+        Return the region they were merged into and the connectors between
+        them, which are no longer needed.
+        """
+        buckets = self._region_connectors
+        redundant = buckets[a].pop(b, [])
+        buckets[b].pop(a, None)
+
+        # Move the buckets of the region with fewer neighbours
+        if len(buckets[a]) < len(buckets[b]):
+            a, b = b, a
+        self._region_parent[b] = a
+
+        for other, bucket in buckets[b].items():
+            del buckets[other][b]
+            existing = buckets[a].get(other)
+            if existing is None:
+                buckets[a][other] = buckets[other][a] = bucket
+            elif len(existing) >= len(bucket):
+                existing.extend(bucket)
+            else:
+                bucket.extend(existing)
+                buckets[a][other] = buckets[other][a] = bucket
+        buckets[b] = {}
 
-            connectors.difference_update(connectors_to_remove)
+        return a, redundant
 
     def create_room(self, room):
         """Carve rectangle into dungeon."""
@@ -260,29 +316,47 @@ class Maze(DunGen):
                 self.carve_cell(x, y)
 
     def add_junction(self, pos):
-        self.tiles[pos[0]][pos[1]].carve()
+        self.tiles.carve(pos[0], pos[1])
 
     def remove_dead_ends(self):
-        done = False
-
-        while not done:
-            done = True
-
-            for y in range(1, self.mz_height):
-                for x in range(1, self.mz_width):
-                    if not self.tiles[x][y].blocked:
+        """
+        Fill in dead ends until every corridor leads somewhere.
 
-                        # If it only has one exit, it's a dead end
-                        exits = 0
-                        for direction in self.DIRECTIONS:
-                            dx, dy = direction[0], direction[1]
-                            if not self.tiles[x+dx][y+dy].blocked:
-                                exits += 1
-                        if exits > 1:
-                            continue
+        Starts with all current dead ends, after filling a tile only its
+        neighbours can have become dead ends. Yields an estimate of the
+        progress (0 to 1) after every row of the search and every few hundred
+        filled tiles.
+        """
+        dead_ends = deque()
+        for y in range(1, self.mz_height):
+            dead_ends.extend((x, y) for x in range(1, self.mz_width) if self.is_dead_end(x, y))
+            yield 0.4 * y / self.mz_height
+
+        filled = 0
+        while dead_ends:
+            x, y = dead_ends.popleft()
+            if not self.is_dead_end(x, y):
+                continue
+
+            self.tiles.block(x, y)
+            filled += 1
+            if filled % 256 == 0:
+                yield 0.4 + 0.6 * filled / (filled + len(dead_ends))
+
+            for dx, dy in self.DIRECTIONS:
+                if self.is_dead_end(x+dx, y+dy):
+                    dead_ends.append((x+dx, y+dy))
+
+    def is_dead_end(self, x, y):
+        """Return True if the tile at (x, y) is open and has at most one exit."""
+        if not (0 < x < self.mz_width and 0 < y < self.mz_height) or self.tiles.is_blocked(x, y):
+            return False
 
-                        done = False
-                        self.tiles[x][y].block()
+        exits = 0
+        for dx, dy in self.DIRECTIONS:
+            if not self.tiles.is_blocked(x+dx, y+dy):
+                exits += 1
+        return exits <= 1
 
     def can_carve(self, position, direction):
         """
@@ -303,7 +377,7 @@ class Maze(DunGen):
         y = position[1] + direction[1]*2
 
         # Destination must not be open
-        return self.tiles[x][y].blocked
+        return self.tiles.is_blocked(x, y)
 
     def distance(self, loc1, loc2):
         return ((loc1[0]-loc2[0])**2 + (loc1[1]-loc2[1])**2) ** 0.5
@@ -312,5 +386,5 @@ class Maze(DunGen):
         self._current_region += 1
 
     def carve_cell(self, x, y):
-        self.tiles[x][y].carve()
+        self.tiles.carve(x, y)
         self._regions[x][y] = self._current_region
@@ -1,5 +1,3 @@
-from random import randint
-
 from map_objects.dungeon_components.rect import Rect
 from map_objects.dungeon_generation.dun_gen import DunGen
 from map_objects.dungeon_helper import Rectangular
@@ -10,14 +8,14 @@ class Tunnel(DunGen, Rectangular):
     Create rectangular rooms of at random locations
     in the dungeon and connect them.
     """
-    def __init__(self, width, height, room_min_size, room_max_size):
-        super().__init__(width, height, noise=True)
+    def __init__(self, width, height, room_min_size, room_max_size, rng=None):
+        super().__init__(width, height, noise=True, rng=rng)
         self.room_min_size = room_min_size
         self.room_max_size = room_max_size
         self.rooms = []
         self.max_rooms = 50
 
-    def create_dungeon(self):
+    def steps(self):
         """
         The location and size of a room are chosen randomly and it will only
         be created if it does not overlap with previously created rooms.
@@ -27,11 +25,11 @@ class Tunnel(DunGen, Rectangular):
         num_rooms = 0
         for r in range(self.max_rooms):
             # Random width and height
-            w = randint(self.room_min_size, self.room_max_size)
-            h = randint(self.room_min_size, self.room_max_size)
+            w = self.rng.randint(self.room_min_size, self.room_max_size)
+            h = self.rng.randint(self.room_min_size, self.room_max_size)
             # Random position without going out of the boundaries of the map
-            x = randint(0, self.width-w-1)
-            y = randint(0, self.height-h-1)
+            x = self.rng.randint(0, self.width-w-1)
+            y = self.rng.randint(0, self.height-h-1)
 
             new_room = Rect(x, y, w, h)
 
@@ -51,4 +49,9 @@ class Tunnel(DunGen, Rectangular):
                 self.rooms.append(new_room)
                 num_rooms += 1
 
-        self.apply_noise("water")
+            yield 0.9 * (r + 1) / self.max_rooms
+
+        self.apply_noise([("mud", 65), ("water", 75)])
+        for progress in self.remove_unreachable():
+            yield 0.9 + 0.1 * progress
+        yield 1.0
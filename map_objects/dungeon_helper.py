@@ -1,6 +1,9 @@
 import libtcodpy as libtcod
 
-from random import randint
+from itertools import accumulate, chain
+from operator import add
+
+from map_objects.dungeon_components.rect import Rect
 
 
 class Rectangular:
@@ -14,17 +17,17 @@ class Rectangular:
         """Go through the tiles in the rectangle and make them passable."""
         for x in range(room.x1+1, room.x2):
             for y in range(room.y1+1, room.y2):
-                self.tiles[x][y].carve()
+                self.tiles.carve(x, y)
 
     def create_h_tunnel(self, x1, x2, y):
         """Create a horizontal tunnel."""
         for x in range(min(x1, x2), max(x1, x2)+1):
-            self.tiles[x][y].carve()
+            self.tiles.carve(x, y)
 
     def create_v_tunnel(self, y1, y2, x):
         """Create a vertical tunnel."""
         for y in range(min(y1, y2), max(y1, y2)+1):
-            self.tiles[x][y].carve()
+            self.tiles.carve(x, y)
 
     def connect_rooms(self, room1, room2):
         """Connect two rooms with tunnels."""
@@ -32,7 +35,7 @@ class Rectangular:
         x2, y2 = room2.center()
 
         # 50% chance to carve horizontal tunnel first
-        if randint(0, 1) == 1:
+        if self.rng.randint(0, 1) == 1:
             self.create_h_tunnel(x2, x1, y2)
             self.create_v_tunnel(y2, y1, x1)
         else:
@@ -41,12 +44,57 @@ class Rectangular:
             self.create_h_tunnel(x2, x1, y1)
 
 
-def noise_2d(width, height):
-    noise = libtcod.noise_new(2)
-    noise_map = {}
-    for x in range(width):
-        for y in range(height):
-            value = libtcod.noise_get(noise, [x*0.06, y*0.06])
-            noise_map[(x, y)] = value * 100
+def noise_2d(width, height, rng, scale=0.06):
+    """
+    Return 2d noise (-100 to 100) as flat row-major list, computed in one
+    pass by libtcod's heightmap.
+    """
+    # Seed libtcod's generator from rng so the noise is reproducible
+    noise_rng = libtcod.random_new_from_seed(rng.getrandbits(32))
+    noise = libtcod.noise_new(2, random=noise_rng)
+
+    # One octave of fbm is the plain noise value at (x*scale, y*scale)
+    heightmap = libtcod.heightmap_new(width, height)
+    libtcod.heightmap_add_fbm(heightmap, noise, width * scale, height * scale, 0, 0, 1, 0, 100)
+    noise_map = heightmap.p.contents.values[:width * height]
+
+    libtcod.heightmap_delete(heightmap)
+    libtcod.noise_delete(noise)
+    libtcod.random_delete(noise_rng)
 
     return noise_map
+
+
+def summed_area_table(mask, width, height):
+    """
+    Return summed-area table of a (row-major) mask as list of rows.
+
+    table[y][x] is the number of set cells in the rectangle from (0, 0) to
+    (x-1, y-1), so the sum over any rectangle takes four lookups.
+    """
+    table = [[0] * (width + 1)]
+    for y in range(height):
+        # accumulate(..., initial=0) would need python 3.8
+        row_sums = accumulate(chain((0,), mask[y * width:(y + 1) * width]))
+        table.append(list(map(add, table[-1], row_sums)))
+    return table
+
+
+def clear_sections(mask, width, height, w, h, step=1):
+    """
+    Return all w*h sections (as Rects) in which every cell of the mask is
+    set. Top left corners of the sections are <step> tiles apart.
+
+    Linear in the number of cells (uses a summed-area table).
+    """
+    table = summed_area_table(mask, width, height)
+    area = w * h
+
+    sections = []
+    for x in range(0, width - w + 1, step):
+        for y in range(0, height - h + 1, step):
+            top, bottom = table[y], table[y + h]
+            if bottom[x + w] - top[x + w] - bottom[x] + top[x] == area:
+                sections.append(Rect(x, y, w, h))
+
+    return sections
@@ -0,0 +1,53 @@
+"""
+Generates a dungeon a slice of time at a time, so a slow generator (a large
+Maze or DrunkardsWalk) does not freeze the window: the caller advances it for
+a few milliseconds per frame and draws the progress in between.
+"""
+import time
+
+
+class FloorBuilder:
+    """
+    Runs the steps of a dungeon generator (see DunGen).
+
+    The same builder can be advanced from different threads one after the
+    other (see FloorPregenerator), but not at the same time.
+    """
+
+    def __init__(self, dungeon):
+        self.dungeon = dungeon
+        self.progress = 0.0
+        self.done = False
+        # Seconds spent generating (without the pauses in between)
+        self.elapsed = 0.0
+        self._steps = dungeon.steps()
+
+    def advance(self, budget):
+        """
+        Run generation steps for about budget seconds (a step may take
+        longer). Return True when the dungeon is complete.
+        """
+        if self.done:
+            return True
+
+        start = time.perf_counter()
+        deadline = start + budget
+        for progress in self._steps:
+            # The estimates of some generators can go back a little
+            self.progress = max(self.progress, progress)
+            if time.perf_counter() >= deadline:
+                break
+        else:
+            self.done = True
+            self.progress = 1.0
+
+        self.elapsed += time.perf_counter() - start
+        if self.done:
+            # Seconds, for statistics (see soak.py)
+            self.dungeon.generation_time = self.elapsed
+        return self.done
+
+    def finish(self):
+        """Run the remaining steps, return the dungeon."""
+        self.advance(float('inf'))
+        return self.dungeon
@@ -0,0 +1,67 @@
+"""
+Generates the next dungeon floor in the background while the current one
+is played, so taking the stairs does not have to wait for (slow) generators
+like Maze or DrunkardsWalk.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from map_objects.floor_builder import FloorBuilder
+
+
+class FloorPregenerator:
+    """
+    Background worker that generates one floor ahead.
+
+    The floor is generated in slices of slice_time seconds, so it can be
+    handed over to (or cancelled by) the main thread between two slices.
+    """
+
+    def __init__(self, slice_time=0.01):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.slice_time = slice_time
+        self.future = None
+        self.builder = None
+        self.stop = None
+        self.dungeon_level = None
+
+    def start(self, game_map, dungeon_level):
+        """Start generating the dungeon of a floor."""
+        self.cancel()
+        self.dungeon_level = dungeon_level
+        self.builder = FloorBuilder(game_map.new_dungeon(dungeon_level))
+        self.stop = threading.Event()
+        self.future = self.executor.submit(self._generate, self.builder, self.stop)
+
+    def _generate(self, builder, stop):
+        while not stop.is_set() and not builder.advance(self.slice_time):
+            pass
+
+    def take(self, dungeon_level):
+        """
+        Return the FloorBuilder of a floor (None if it has not been requested).
+
+        Background generation stops after the slice it is running, the caller
+        finishes the floor if it is not complete yet (e.g. time-sliced, see
+        engine.build_floor) instead of waiting for the worker.
+        """
+        if self.future is None or self.dungeon_level != dungeon_level:
+            self.cancel()
+            return None
+
+        builder = self.builder
+        self.stop.set()
+        # Waits for the current slice at most (raises if generation failed)
+        self.future.result()
+        self.future = self.builder = None
+        return builder
+
+    def cancel(self):
+        if self.future:
+            self.stop.set()
+            self.future.cancel()
+            self.future = self.builder = None
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=False)
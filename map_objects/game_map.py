@@ -2,7 +2,7 @@
 Handles dungeon generation and progression logic and places entities on the map.
 """
 import libtcodpy as libtcod
-import random as rd
+import random
 
 from components.ai import BasicMonster
 from components.equipment import Equipment
@@ -10,15 +10,18 @@ from components.equippable import Equippable
 from components.fighter import Fighter
 from components.inventory import Inventory
 from components.item import Item
-from entity import Entity
+from entity import Entity, EntityList
 from game_messages import Message
 from map_objects.dungeon_generation.bsp_tree import BSPTree
 from map_objects.dungeon_generation.buildings import Buildings
 from map_objects.dungeon_generation.drunkards_walk import DrunkardsWalk
 from map_objects.dungeon_generation.maze import Maze
 from map_objects.dungeon_generation.tunnel import Tunnel
+from map_objects.floor_builder import FloorBuilder
 from map_objects.items import consumables, equipment, max_items_dungeon
 from map_objects.monsters import max_monsters_dungeon, monsters
+from map_objects.path_map import PathMap
+from map_objects.regions import label_regions
 from map_objects.stairs import Stairs
 from random_utils import from_dungeon_level, random_choice_from_dict
 from render_functions import RenderOrder
@@ -28,15 +31,26 @@ class GameMap:
     """
     Methods for initializing tiles and creating rooms
     with monsters and items.
+
+    Every floor is generated and populated with its own random number
+    generator, derived from seed (random if None) and the dungeon level, so a
+    seed always produces the same floors. rng is used during play.
     """
-    def __init__(self, width, height, room_min_size, room_max_size, dungeon_level=1):
+    def __init__(self, width, height, room_min_size, room_max_size, dungeon_level=1, seed=None):
         self.width = width
         self.height = height
         self.room_min_size = room_min_size
         self.room_max_size = room_max_size
         self.dungeon_level = dungeon_level
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.rng = random.Random(seed)
         self.dungeon = None
         self.tiles = None
+        self.path_map = None
+        # Tiles that changed type since the last frame (see MapRenderer)
+        self.changed_tiles = set()
 
         self.dun_gens = {
             Tunnel: (self.width, self.height, self.room_min_size, self.room_max_size),
@@ -48,40 +62,91 @@ class GameMap:
 
     def is_blocked(self, x, y):
         """Return True if tile is blocked, otherwise False."""
-        return self.dungeon.tiles[x][y].blocked
+        return self.tiles.is_blocked(x, y)
+
+    def set_tile(self, x, y, tile_type):
+        """Change type of a tile and keep the path map up to date."""
+        self.tiles.set_type(x, y, tile_type)
+        self.path_map.update_tile(x, y)
+        self.changed_tiles.add((x, y))
+
+    def floor_rng(self, dungeon_level):
+        """Return random number generator for generating a floor."""
+        return random.Random('{0}:{1}'.format(self.seed, dungeon_level))
+
+    def new_dungeon(self, dungeon_level, dungeon_type=None):
+        """
+        Return the (not yet generated) dungeon of a floor, random dungeon type
+        if None. Generate it with a FloorBuilder.
+
+        Does not change the game map, so generation can run in the background
+        (see FloorPregenerator).
+        """
+        rng = self.floor_rng(dungeon_level)
+        if dungeon_type is None:
+            dungeon_type = rng.choice([BSPTree, DrunkardsWalk, Maze, Tunnel])
 
-    def make_map(self, dungeon_type, player, entities):
-        """Carve randomly generated rooms out of the game map."""
         parameters = self.dun_gens[dungeon_type]
-        self.dungeon = dungeon_type(*parameters)
-        self.dungeon.create_dungeon()
+        return dungeon_type(*parameters, rng=rng)
+
+    def generate_floor(self, dungeon_level, dungeon_type=None):
+        """Create the dungeon layout of a floor in one go (random dungeon type if None)."""
+        return FloorBuilder(self.new_dungeon(dungeon_level, dungeon_type)).finish()
+
+    def make_map(self, dungeon_type, player, entities, dungeon=None):
+        """
+        Carve randomly generated rooms out of the game map.
+
+        A dungeon that has already been generated can be passed in.
+        """
+        if dungeon is None:
+            dungeon = self.generate_floor(self.dungeon_level, dungeon_type)
+        dungeon_type = type(dungeon)
+
+        self.dungeon = dungeon
         self.tiles = self.dungeon.tiles
+        rng = self.dungeon.rng
+
+        if self.path_map:
+            self.path_map.delete()
+        self.path_map = PathMap(self.tiles)
+
+        # The generators remove unreachable parts, but the stairs and the
+        # entities are only placed where the player can walk to anyway
+        regions = label_regions(self.tiles)
 
         if dungeon_type in (BSPTree, Maze, Tunnel):
             # Put player in first room
-            player.x, player.y = self.dungeon.rooms[0].center()
+            player.place(*self.dungeon.rooms[0].center())
+            start = regions.region(player.x, player.y)
+            rooms = [room for room in self.dungeon.rooms if regions.region(*room.center()) == start]
+            reachable = regions.mask(start)
 
             # Put entities into every other room
-            for room in self.dungeon.rooms[1:]:
-                self.place_entities(room, entities)
+            for room in rooms[1:]:
+                self.place_entities(room, entities, reachable)
 
             # Put stairs in last room
-            center_last_room_x, center_last_room_y = self.dungeon.rooms[-1].center()
+            center_last_room_x, center_last_room_y = rooms[-1].center()
             self.place_stairs(center_last_room_x, center_last_room_y, entities)
 
         elif dungeon_type in (Buildings, DrunkardsWalk):
             # Choose player and stairs location at random
-            player.x, player.y = rd.choice(self.dungeon.spawn_locations)
-            stairs_x, stairs_y = rd.choice(self.dungeon.spawn_locations)
+            player.place(*rng.choice(self.dungeon.spawn_locations))
+            start = regions.region(player.x, player.y)
+            reachable = regions.mask(start)
+            spawn_locations = self.tiles.cells(bytes(a & b for a, b in zip(self.tiles.spawn_mask(), reachable)))
+
             # Make sure they are not at the same location
-            while (stairs_x, stairs_y) == (player.x, player.y):
-                stairs_x, stairs_y = rd.choice(self.dungeon.cleared)
+            stairs_locations = [cell for cell in spawn_locations if cell != (player.x, player.y)]
+            if not stairs_locations:
+                raise ValueError('no room for the stairs in the region of the player')
 
-            self.place_stairs(stairs_x, stairs_y, entities)
+            self.place_stairs(*rng.choice(stairs_locations), entities)
 
             if dungeon_type == DrunkardsWalk:
                 for zone in self.dungeon.zones:
-                    self.place_entities(zone, entities)
+                    self.place_entities(zone, entities, reachable)
 
     def create_item_entity(self, x, y, entity_data, is_equippable=False):
         """
@@ -100,7 +165,8 @@ class GameMap:
         char, color, name = entity_data['entity_args']
 
         item_entity = Entity(x, y, char, color, name, render_order=RenderOrder.ITEM,
-                                item=item_component, equippable=equippable_component, description=entity_data['description'])
+                                item=item_component, equippable=equippable_component, description=entity_data['description'],
+                                template=entity_data['id'])
 
         return item_entity
 
@@ -123,7 +189,8 @@ class GameMap:
 
         monster_entity = Entity(x, y, char, color, name, blocks=True,
                                 render_order=RenderOrder.ACTOR, fighter=fighter_component,
-                                ai=ai_component, inventory=inventory_component, equipment=equipment_component, description=entity_data['description'])
+                                ai=ai_component, inventory=inventory_component, equipment=equipment_component, description=entity_data['description'],
+                                template=entity_data['id'])
 
         if equipment:
             for item in equipment:
@@ -133,13 +200,19 @@ class GameMap:
 
         return monster_entity
 
-    def place_entities(self, room, entities):
-        """Place a random number of monsters in each room of the map."""
+    def place_entities(self, room, entities, reachable=None):
+        """
+        Place a random number of monsters in each room of the map.
+
+        Nothing is placed on cells that are not set in the reachable mask
+        (see Regions.mask), if it is given.
+        """
+        rng = self.dungeon.rng
         max_monsters_per_room = from_dungeon_level(max_monsters_dungeon, self.dungeon_level)
         max_items_per_room = from_dungeon_level(max_items_dungeon, self.dungeon_level)
         # Get a random number of monsters and items
-        number_of_monsters = rd.randint(0, max_monsters_per_room)
-        number_of_items = rd.randint(0, max_items_per_room)
+        number_of_monsters = rng.randint(0, max_monsters_per_room)
+        number_of_items = rng.randint(0, max_items_per_room)
         # Generate dictionary (elem -> chance ) for the appropriate dungeon level
         monster_chances = {m['id']: from_dungeon_level(m['spawn_chance'], self.dungeon_level) for m in monsters}
         consumables_chances = {c['id']: from_dungeon_level(c['drop_chance'], self.dungeon_level) for c in consumables}
@@ -148,12 +221,11 @@ class GameMap:
         # === Monsters ===
         for i in range(number_of_monsters):
             # Choose a random location in the room
-            x = rd.randint(room.x1 + 1, room.x2 - 1)
-            y = rd.randint(room.y1 + 1, room.y2 - 1)
+            x = rng.randint(room.x1 + 1, room.x2 - 1)
+            y = rng.randint(room.y1 + 1, room.y2 - 1)
 
-            tile_occupied = any([entity for entity in entities if entity.x == x and entity.y == y])
-            if not tile_occupied and self.tiles[x][y].can_spawn:
-                monster_choice = random_choice_from_dict(monster_chances)
+            if not entities.at(x, y) and self.tiles.can_spawn(x, y) and self.is_reachable(x, y, reachable):
+                monster_choice = random_choice_from_dict(monster_chances, rng)
 
                 for monster in monsters:
                     if monster_choice == monster['id']:
@@ -163,22 +235,21 @@ class GameMap:
 
         # === Items ===
         for i in range(number_of_items):
-            x = rd.randint(room.x1 + 1, room.x2 - 1)
-            y = rd.randint(room.y1 + 1, room.y2 - 1)
+            x = rng.randint(room.x1 + 1, room.x2 - 1)
+            y = rng.randint(room.y1 + 1, room.y2 - 1)
 
-            tile_occupied = any([entity for entity in entities if entity.x == x and entity.y == y])
-            if not tile_occupied and self.tiles[x][y].can_spawn:
-                select_item_pool = rd.randint(0, 100)
+            if not entities.at(x, y) and self.tiles.can_spawn(x, y) and self.is_reachable(x, y, reachable):
+                select_item_pool = rng.randint(0, 100)
 
                 if select_item_pool < 70:
-                    item_choice = random_choice_from_dict(consumables_chances)
+                    item_choice = random_choice_from_dict(consumables_chances, rng)
 
                     for consumable in consumables:
                         if item_choice == consumable['id']:
                             item = self.create_item_entity(x, y, consumable)
 
                 else:
-                    item_choice = random_choice_from_dict(equipment_chances)
+                    item_choice = random_choice_from_dict(equipment_chances, rng)
 
                     for equippable in equipment:
                         if item_choice == equippable['id']:
@@ -186,20 +257,30 @@ class GameMap:
 
                 entities.append(item)
 
+    def is_reachable(self, x, y, reachable):
+        return reachable is None or reachable[self.tiles.index(x, y)] == 1
+
+    def create_stairs_entity(self, x, y):
+        """Create stairs to the next floor at coordinates."""
+        stairs_component = Stairs(self.dungeon_level + 1)
+        return Entity(x, y, '>', libtcod.lightest_grey, 'Stairs',
+                      render_order=RenderOrder.STAIRS, stairs=stairs_component, template='stairs')
+
     def place_stairs(self, x, y, entities):
         """Create stairs at coordinates."""
-        stairs_component = Stairs(self.dungeon_level + 1)
-        down_stairs = Entity(x, y, '>', libtcod.lightest_grey, 'Stairs',
-                             render_order=RenderOrder.STAIRS, stairs=stairs_component)
-        entities.append(down_stairs)
+        entities.append(self.create_stairs_entity(x, y))
 
-    def next_floor(self, player, message_log, constants):
-        """"Reset entities (except player) and generate a new dungeon floor."""
+    def next_floor(self, player, message_log, constants, dungeon=None):
+        """
+        Reset entities (except player) and generate a new dungeon floor
+        (unless its dungeon has been generated in advance).
+        """
         self.dungeon_level += 1
-        entities = [player]
+        entities = EntityList([player])
 
-        dungeon_type = rd.choice([BSPTree, DrunkardsWalk, Maze, Tunnel])
-        self.make_map(dungeon_type, player, entities)
+        if dungeon is None:
+            dungeon = self.generate_floor(self.dungeon_level)
+        self.make_map(type(dungeon), player, entities, dungeon)
 
         player.fighter.heal(player.fighter.max_hp // 2)
 
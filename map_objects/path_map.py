@@ -0,0 +1,98 @@
+"""
+Shared pathing data for monsters.
+
+A single walkability map is kept for the whole floor and a Dijkstra
+distance field to the player is computed (at most) once per turn.
+Monsters then simply step to the neighbouring tile that is closest to
+the player instead of computing their own path.
+"""
+import libtcodpy as libtcod
+
+from entity import get_blocking_entities_at_location
+
+
+class PathMap:
+    """Walkability map and distance field (flow field) of a game map."""
+
+    # 1.41 = sqrt(1sq + 1sq), the normal diagonal cost of moving
+    diagonal_cost = 1.41
+    # Monsters further away than this will not follow the field
+    # (keeps them from running around the map to find an alternative path)
+    max_distance = 25
+
+    NEIGHBOURS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+    def __init__(self, tiles):
+        self.tiles = tiles
+        self._initialize()
+
+    def _initialize(self):
+        """Create libtcod walkability map and Dijkstra path from the tiles."""
+        tiles = self.tiles
+        self.walk_map = libtcod.map_new(tiles.width, tiles.height)
+
+        blocked = tiles.blocked_mask()
+        block_sight = tiles.block_sight_mask()
+        for i in range(len(blocked)):
+            x, y = tiles.coordinates(i)
+            libtcod.map_set_properties(self.walk_map, x, y, not block_sight[i], not blocked[i])
+
+        self.dijkstra = libtcod.dijkstra_new(self.walk_map, self.diagonal_cost)
+        self.target = None
+
+    def update_tile(self, x, y):
+        """Update walkability of a tile after it changed type."""
+        libtcod.map_set_properties(self.walk_map, x, y, not self.tiles.blocks_sight(x, y),
+                                   not self.tiles.is_blocked(x, y))
+        # Distances are no longer valid
+        self.target = None
+
+    def compute(self, target_x, target_y):
+        """Compute distance field to target (skipped if the target did not move)."""
+        if self.target == (target_x, target_y):
+            return
+
+        libtcod.dijkstra_compute(self.dijkstra, target_x, target_y)
+        self.target = (target_x, target_y)
+
+    def distance(self, x, y):
+        """Return walking distance from (x, y) to the target (-1 if unreachable)."""
+        return libtcod.dijkstra_get_distance(self.dijkstra, x, y)
+
+    def next_step(self, x, y, entities):
+        """
+        Return (dx, dy) towards the neighbouring tile that is closest to the
+        target and not blocked by an entity. Return None if there is no such
+        tile or the target is out of reach.
+        """
+        current_distance = self.distance(x, y)
+        if current_distance < 0 or current_distance >= self.max_distance:
+            return None
+
+        best_step = None
+        best_distance = current_distance
+
+        for dx, dy in self.NEIGHBOURS:
+            new_x, new_y = x + dx, y + dy
+            if not self.tiles.in_bounds(new_x, new_y):
+                continue
+
+            distance = self.distance(new_x, new_y)
+            if 0 <= distance < best_distance and not get_blocking_entities_at_location(entities, new_x, new_y):
+                best_step = (dx, dy)
+                best_distance = distance
+
+        return best_step
+
+    def delete(self):
+        """Free the libtcod map and path."""
+        libtcod.dijkstra_delete(self.dijkstra)
+        libtcod.map_delete(self.walk_map)
+
+    def __getstate__(self):
+        # libtcod handles can not be saved, they are recreated on load
+        return {'tiles': self.tiles}
+
+    def __setstate__(self, state):
+        self.tiles = state['tiles']
+        self._initialize()
@@ -0,0 +1,128 @@
+"""
+Connected regions of the passable tiles of a floor.
+
+Used to repair floors with parts that cannot be reached (see
+DunGen.remove_unreachable) and to keep the stairs and the spawned entities
+in the player's region (see GameMap.make_map).
+"""
+import re
+from array import array
+
+# Runs of passable cells in a row of a blocked mask
+PASSABLE_RUN = re.compile(b'\x00+')
+
+
+class Regions:
+    """
+    Connected regions of a map. Cells are connected to their 8 neighbours,
+    like the player and the monsters move.
+
+    labels holds the region id of every cell in row-major order (-1 for
+    blocked cells), sizes the number of cells of every region. Regions are
+    numbered in the order their first cell appears.
+    """
+    def __init__(self, width, height, labels, sizes):
+        self.width = width
+        self.height = height
+        self.labels = labels
+        self.sizes = sizes
+
+    def region(self, x, y):
+        """Return id of the region of the cell at (x, y), -1 if it is blocked."""
+        return self.labels[y * self.width + x]
+
+    def connected(self, x1, y1, x2, y2):
+        """Return True if (x2, y2) can be reached from (x1, y1)."""
+        region = self.region(x1, y1)
+        return region != -1 and region == self.region(x2, y2)
+
+    @property
+    def largest(self):
+        """Id of the region with the most cells (None if every cell is blocked)."""
+        if not self.sizes:
+            return None
+        return max(range(len(self.sizes)), key=self.sizes.__getitem__)
+
+    def mask(self, region):
+        """Return mask of the cells of a region (see TileGrid.cells)."""
+        return bytes(label == region for label in self.labels)
+
+
+def label_regions(tiles):
+    """Return the Regions of a TileGrid."""
+    steps = label_steps(tiles)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as done:
+            return done.value
+
+
+def label_steps(tiles, rows=16):
+    """
+    Label the regions of tiles step by step: a generator that yields the
+    progress (0 to 1) every few rows and returns the Regions, use it with
+    yield from (see DunGen.remove_unreachable).
+
+    Every row is split into runs of passable cells, runs in neighbouring rows
+    that touch (diagonally too) are joined with a union-find. This needs a
+    step per run instead of per cell like a flood fill.
+    """
+    width, height = tiles.width, tiles.height
+    blocked = tiles.blocked_mask()
+
+    # (y, start, end) of every run, union-find parent of every run
+    runs = []
+    parent = []
+
+    def find(run):
+        while parent[run] != run:
+            # Path halving
+            parent[run] = parent[parent[run]]
+            run = parent[run]
+        return run
+
+    above = []
+    for y in range(height):
+        row = blocked[y * width:(y + 1) * width]
+        current = []
+        i = 0
+        for match in PASSABLE_RUN.finditer(row):
+            start, end = match.span()
+            run = len(runs)
+            runs.append((y, start, end))
+            parent.append(run)
+
+            # Skip the runs above that end left of this one, join the ones
+            # that touch it (the next run may touch the last of them too)
+            while i < len(above) and runs[above[i]][2] < start:
+                i += 1
+            j = i
+            while j < len(above) and runs[above[j]][1] <= end:
+                root, other = find(run), find(above[j])
+                if root != other:
+                    parent[max(root, other)] = min(root, other)
+                j += 1
+
+            current.append(run)
+        above = current
+
+        if y % rows == 0:
+            yield 0.8 * y / height
+
+    labels = array('i', [-1]) * (width * height)
+    sizes = []
+    ids = {}
+    for run, (y, start, end) in enumerate(runs):
+        root = find(run)
+        region = ids.get(root)
+        if region is None:
+            region = ids[root] = len(sizes)
+            sizes.append(0)
+        sizes[region] += end - start
+        labels[y * width + start:y * width + end] = array('i', [region]) * (end - start)
+
+        if run % 4096 == 0:
+            yield 0.8 + 0.2 * run / len(runs)
+
+    return Regions(width, height, labels, sizes)
@@ -170,6 +170,30 @@ def message_box(con, header, width, screen_width, screen_height, colors):
     menu(con, header, [], width, screen_width, screen_height, colors)
 
 
+def progress_box(header, progress, width, screen_width, screen_height, colors):
+    """Show box with header and progress bar (progress from 0 to 1) in center of the screen."""
+    window = libtcod.console_new(width, 2)
+
+    libtcod.console_set_default_foreground(window, colors['text_default'])
+    libtcod.console_print_ex(window, 0, 0, libtcod.BKGND_NONE, libtcod.LEFT, header)
+
+    libtcod.console_set_default_background(window, colors['render_bar_bg'])
+    libtcod.console_rect(window, 0, 1, width, 1, False, libtcod.BKGND_SCREEN)
+
+    bar_width = int(progress * width)
+    libtcod.console_set_default_background(window, colors['render_bar_fg'])
+    if bar_width > 0:
+        libtcod.console_rect(window, 0, 1, bar_width, 1, False, libtcod.BKGND_SCREEN)
+
+    libtcod.console_print_ex(window, width // 2, 1, libtcod.BKGND_NONE, libtcod.CENTER,
+                             '{0}%'.format(int(progress * 100)))
+
+    x = int(screen_width / 2 - width / 2)
+    y = int(screen_height / 2 - 1)
+    libtcod.console_blit(window, 0, 0, width, 2, 0, x, y, 1.0, 0.7)
+    libtcod.console_delete(window)
+
+
 def description_box(con, description, width, screen_width, screen_height, x, y, colors):
     """Show box at specific location with description of entity."""
     height = libtcod.console_get_height_rect(con, 0, 0, width, screen_height, description)
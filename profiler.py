@@ -0,0 +1,114 @@
+"""
+Per-frame timing of the main loop.
+
+Each phase of a frame (see PHASES) is timed with FrameProfiler.phase. The
+last `window` frames give rolling p50 / p95 / max per phase for the panel
+overlay (F3), and every frame can be appended to a CSV or JSONL file
+(chosen by the file extension) for offline analysis.
+"""
+import csv
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+# input: key / mouse handling, fov and enemy: inside GameSession.step,
+# map, ents, panel and menu: render_all, flush: console_flush, clear: clear_all,
+# total: the whole frame
+PHASES = ('input', 'fov', 'enemy', 'map', 'ents', 'panel', 'menu', 'flush', 'clear', 'total')
+
+
+class _NotTimed:
+    """Context manager that does nothing (contextlib.nullcontext needs python 3.7)."""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOT_TIMED = _NotTimed()
+
+
+def percentile(ordered, fraction):
+    """Return the nearest rank percentile of a sorted, non-empty list."""
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class FrameProfiler:
+    """Rolling timings of the main loop phases, in milliseconds."""
+
+    def __init__(self, window=300, export_path=None, enabled=True):
+        self.enabled = enabled
+        # Draw the overlay on the side panel
+        self.show = False
+
+        self.samples = {name: deque(maxlen=window) for name in PHASES}
+        self.frame_count = 0
+        # Time spent in each phase during the current frame (a phase may run
+        # more than once per frame)
+        self._frame = {}
+        self._frame_start = time.perf_counter()
+
+        self._export = None
+        self._writer = None
+        if export_path:
+            self._export = open(export_path, 'w', newline='')
+            if export_path.endswith('.csv'):
+                self._writer = csv.writer(self._export)
+                self._writer.writerow(('frame',) + PHASES)
+
+    def phase(self, name):
+        """Return context manager that adds its run time to the phase name."""
+        if not self.enabled:
+            return _NOT_TIMED
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._frame[name] = self._frame.get(name, 0) + (time.perf_counter() - start) * 1000
+
+    def end_frame(self):
+        """Record the timings of the finished frame and start the next one."""
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        frame = self._frame
+        frame['total'] = (now - self._frame_start) * 1000
+
+        for name, elapsed in frame.items():
+            self.samples[name].append(elapsed)
+
+        if self._writer:
+            self._writer.writerow([self.frame_count] + [
+                '{0:.3f}'.format(frame[name]) if name in frame else '' for name in PHASES])
+        elif self._export:
+            row = {'frame': self.frame_count}
+            row.update((name, round(frame[name], 3)) for name in PHASES if name in frame)
+            self._export.write(json.dumps(row) + '\n')
+
+        self.frame_count += 1
+        self._frame = {}
+        self._frame_start = now
+
+    def stats(self):
+        """Return list of (phase, p50, p95, max) for phases timed in the window."""
+        stats = []
+        for name in PHASES:
+            if self.samples[name]:
+                ordered = sorted(self.samples[name])
+                stats.append((name, percentile(ordered, 0.5), percentile(ordered, 0.95), ordered[-1]))
+        return stats
+
+    def close(self):
+        if self._export:
+            self._export.close()
+            self._export = None
+            self._writer = None
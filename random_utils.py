@@ -1,4 +1,4 @@
-from random import randint
+import random
 
 
 def from_dungeon_level(table, dungeon_level):
@@ -13,9 +13,9 @@ def from_dungeon_level(table, dungeon_level):
     return 0
 
 
-def random_choice_index(chances):
+def random_choice_index(chances, rng=random):
     """Get a random index from a list of spawn chances (weights)."""
-    random_chance = randint(1, sum(chances))
+    random_chance = rng.randint(1, sum(chances))
 
     running_sum = 0
     choice = 0
@@ -27,7 +27,7 @@ def random_choice_index(chances):
         choice += 1
 
 
-def random_choice_from_dict(choice_dict):
+def random_choice_from_dict(choice_dict, rng=random):
     """
     Select a random key from a dictionary that has spawn chances as values.
 
@@ -36,4 +36,4 @@ def random_choice_from_dict(choice_dict):
     choices = list(choice_dict.keys())
     chances = list(choice_dict.values())
 
-    return choices[random_choice_index(chances)]
+    return choices[random_choice_index(chances, rng)]
@@ -1,7 +1,10 @@
 import libtcodpy as libtcod
 
 from enum import Enum, auto
+from operator import add
+
 from game_states import GameStates
+from map_objects.dungeon_components.tile import CHARACTER, COLORS_DARK, COLORS_LIT, TILE_NAMES
 from menus import character_screen, equipment_menu, inventory_menu, level_up_menu, description_box
 
 
@@ -15,28 +18,32 @@ class RenderOrder(Enum):
     ACTOR = auto()
 
 
-def get_names_under_mouse(mouse, entities, fov_map):
+def get_names_under_mouse(mouse, entities, fov_map, camera):
     """Return name of entity if mouse is on top."""
-    (x, y) = (mouse.cx, mouse.cy)
+    cell = camera.to_world(mouse.cx, mouse.cy)
+    if cell is None:
+        return ''
 
-    names = [entity.name for entity in entities
-                if entity.x == x and entity.y == y and libtcod.map_is_in_fov(fov_map, entity.x, entity.y)]
+    names = [entity.name for entity in entities.at(*cell)
+                if libtcod.map_is_in_fov(fov_map, entity.x, entity.y)]
 
     names = ', '.join(names)
 
     return names.capitalize()
 
 
-def get_entity_information_under_mouse(mouse, entities, fov_map):
+def get_entity_information_under_mouse(mouse, entities, fov_map, camera):
     """
     Return description of entity if mouse is on top.
 
     When applicable, show equipped items.
     """
-    (x, y) = (mouse.cx, mouse.cy)
+    cell = camera.to_world(mouse.cx, mouse.cy)
+    if cell is None:
+        return ''
 
-    under_mouse = [entity for entity in entities
-                    if entity.x == x and entity.y == y and libtcod.map_is_in_fov(fov_map, entity.x, entity.y)]
+    under_mouse = [entity for entity in entities.at(*cell)
+                    if libtcod.map_is_in_fov(fov_map, entity.x, entity.y)]
 
     description = [entity.description for entity in under_mouse if entity.description]
 
@@ -53,9 +60,11 @@ def get_entity_information_under_mouse(mouse, entities, fov_map):
     return information
 
 
-def show_target(cursor, mouse, key, map_width, map_height, targeting_item):
+def show_target(cursor, mouse, key, camera, targeting_item):
     """Show target and impact radius (when applicable)."""
-    (x, y) = (mouse.cx, mouse.cy)
+    # The cursor console covers the view
+    x = mouse.cx - camera.screen_x
+    y = mouse.cy - camera.screen_y
     # Check if item component has a radius defined
     item_component = targeting_item.item
     radius = item_component.function_kwargs.get('radius')
@@ -70,7 +79,177 @@ def show_target(cursor, mouse, key, map_width, map_height, targeting_item):
     else:
         libtcod.console_set_char_background(cursor, x, y, libtcod.lightest_grey)
 
-    libtcod.console_blit(cursor, 0, 0, map_width, map_height, 0, 0, 0, 1.0, 0.5)
+    libtcod.console_blit(cursor, 0, 0, camera.width, camera.height, 0, camera.screen_x, camera.screen_y, 1.0, 0.5)
+
+
+class MapRenderer:
+    """
+    Draw the tiles of the game map in the camera's view on the map console
+    (con, the size of the view).
+
+    Remembers which cells were in FOV in the previous frame and only redraws
+    cells whose visibility, explored flag or tile type changed (and cells
+    entities have left, see render_all), instead of the whole view. The
+    whole view is redrawn when the camera moved.
+    """
+    def __init__(self, con, fov_radius, camera):
+        self.con = con
+        self.fov_radius = fov_radius
+        self.camera = camera
+        # Camera position the console was drawn at
+        self.origin = None
+        self.tiles = None
+        self.visible = set()
+        self.dirty = set()
+        # Cells entities were drawn on in the previous frame
+        self.entity_cells = set()
+        self._colors = {}
+
+    def mark_dirty(self, x, y):
+        """Redraw cell in the next frame."""
+        self.dirty.add((x, y))
+
+    def render(self, game_map, fov_map, fov_recompute, x, y):
+        tiles = game_map.tiles
+        camera = self.camera
+
+        if tiles is not self.tiles or (camera.x, camera.y) != self.origin:
+            # New map or scrolled, draw the whole view
+            libtcod.console_clear(self.con)
+            self.tiles = tiles
+            self.origin = (camera.x, camera.y)
+            self.visible = self._visible_cells(fov_map, tiles, x, y)
+            cells = ((a, b) for a in self._view_range(camera.x, camera.width, tiles.width)
+                     for b in self._view_range(camera.y, camera.height, tiles.height))
+        else:
+            cells = self.dirty | game_map.changed_tiles
+            if fov_recompute:
+                visible = self._visible_cells(fov_map, tiles, x, y)
+                # Cells that entered or left the FOV
+                cells |= visible ^ self.visible
+                self.visible = visible
+
+        game_map.changed_tiles.clear()
+        self.dirty = set()
+
+        for cell in cells:
+            if camera.in_view(*cell):
+                self.draw_tile(tiles, cell[0], cell[1], cell in self.visible)
+
+    def draw_tile(self, tiles, x, y, visible):
+        if visible:
+            tiles.set_explored(x, y)
+        elif not tiles.is_explored(x, y):
+            return
+
+        tile_fg, tile_bg = tiles.colors(x, y, lit=visible)
+        libtcod.console_put_char_ex(self.con, x - self.camera.x, y - self.camera.y, tiles.character(x, y),
+                                    self._color(tile_fg), self._color(tile_bg))
+
+    @staticmethod
+    def _view_range(start, length, map_length):
+        """Return range of the world coordinates in the view (along one axis)."""
+        return range(start, min(start + length, map_length))
+
+    def _visible_cells(self, fov_map, tiles, x, y):
+        """
+        Return set of cells in FOV (only cells within the FOV radius, or in
+        the view if there is no radius, are checked).
+        """
+        camera = self.camera
+        if self.fov_radius:
+            x_range = range(max(0, x - self.fov_radius), min(tiles.width, x + self.fov_radius + 1))
+            y_range = range(max(0, y - self.fov_radius), min(tiles.height, y + self.fov_radius + 1))
+        else:
+            x_range = self._view_range(camera.x, camera.width, tiles.width)
+            y_range = self._view_range(camera.y, camera.height, tiles.height)
+
+        return {(a, b) for a in x_range for b in y_range if libtcod.map_is_in_fov(fov_map, a, b)}
+
+    def _color(self, rgb):
+        """Return (cached) libtcod color."""
+        color = self._colors.get(rgb)
+        if color is None:
+            color = self._colors[rgb] = libtcod.Color(*rgb)
+        return color
+
+
+def _layer_tables():
+    """
+    Build translation tables that map the state of a cell to its glyph and
+    color channels (used with bytes.translate).
+
+    The state of a cell is tile id * 3 + lighting, where lighting is
+    0 (unexplored), 1 (explored) or 2 (in FOV).
+    """
+    glyph = bytearray(256)
+    fg = [bytearray(256) for channel in range(3)]
+    bg = [bytearray(256) for channel in range(3)]
+
+    for tile_id in range(len(TILE_NAMES)):
+        # Unexplored cells are left blank
+        glyph[tile_id * 3] = ord(' ')
+
+        for lighting, (tile_fg, tile_bg) in ((1, COLORS_DARK[tile_id]), (2, COLORS_LIT[tile_id])):
+            state = tile_id * 3 + lighting
+            glyph[state] = ord(CHARACTER[tile_id])
+            for channel in range(3):
+                fg[channel][state] = tile_fg[channel]
+                bg[channel][state] = tile_bg[channel]
+
+    state_base = bytes(min(tile_id * 3, 255) for tile_id in range(256))
+
+    return state_base, bytes(glyph), [bytes(c) for c in fg], [bytes(c) for c in bg]
+
+
+STATE_BASE, GLYPH_LAYER, FG_LAYERS, BG_LAYERS = _layer_tables()
+
+
+class BulkMapRenderer(MapRenderer):
+    """
+    Draw the tiles of the game map by composing the glyph, foreground and
+    background layers of the view from the tile grid and the FOV / explored
+    flags, then uploading each layer with one console_fill_* call (instead
+    of one console_put_char_ex call per cell).
+
+    The map console must have the same size as the camera's view.
+    """
+    def render(self, game_map, fov_map, fov_recompute, x, y):
+        tiles = game_map.tiles
+        camera = self.camera
+
+        if tiles is not self.tiles or fov_recompute or (camera.x, camera.y) != self.origin:
+            self.tiles = tiles
+            self.origin = (camera.x, camera.y)
+            self.visible = self._visible_cells(fov_map, tiles, x, y)
+        elif not (self.dirty or game_map.changed_tiles):
+            return
+
+        game_map.changed_tiles.clear()
+        self.dirty = set()
+
+        view_width = camera.width
+        in_fov = bytearray(view_width * camera.height)
+        for a, b in self.visible:
+            tiles.explored[tiles.index(a, b)] = 1
+            if camera.in_view(a, b):
+                in_fov[(b - camera.y) * view_width + a - camera.x] = 1
+
+        # Copy the rows of the map in the view, cells beyond the edges of a
+        # map smaller than the view stay 0 (unexplored, blank)
+        states = bytearray(len(in_fov))
+        columns = len(self._view_range(camera.x, view_width, tiles.width))
+        for row, b in enumerate(self._view_range(camera.y, camera.height, tiles.height)):
+            start = tiles.index(camera.x, b)
+            view_start = row * view_width
+            states[view_start:view_start + columns] = map(
+                add, tiles.types[start:start + columns].translate(STATE_BASE),
+                map(add, tiles.explored[start:start + columns], in_fov[view_start:view_start + columns]))
+        states = bytes(states)
+
+        libtcod.console_fill_char(self.con, states.translate(GLYPH_LAYER))
+        libtcod.console_fill_foreground(self.con, *[states.translate(layer) for layer in FG_LAYERS])
+        libtcod.console_fill_background(self.con, *[states.translate(layer) for layer in BG_LAYERS])
 
 
 def render_bar(panel, x, y, total_width, name, value, maximum, text_color, bar_color, back_color):
@@ -104,111 +283,133 @@ def render_info(panel, x, y, name, color, value=None, bonus=0):
                                 libtcod.LEFT, info)
 
 
+def render_profiler(panel, x, y, stats, colors):
+    """Render frame timings (ms) of the main loop phases, see profiler."""
+    libtcod.console_set_default_foreground(panel, colors['text_emphasize'])
+    libtcod.console_print_ex(panel, x, y, libtcod.BKGND_NONE, libtcod.LEFT, f'{"ms":<5}{"p50":>4}{"p95":>5}{"max":>5}')
+
+    libtcod.console_set_default_foreground(panel, colors['text_desaturate'])
+    for name, p50, p95, maximum in stats:
+        y += 1
+        libtcod.console_print_ex(panel, x, y, libtcod.BKGND_NONE, libtcod.LEFT,
+                                    f'{name:<5}{p50:4.1f}{p95:5.1f}{maximum:5.1f}')
+
+
 def render_all(con, panel, cursor, entities, player, game_map, fov_map, fov_recompute, message_log, screen_width,
-                screen_height, bar_width, panel_width, panel_x, mouse, colors, game_state, targeting_item, key):
+                screen_height, bar_width, panel_width, panel_x, mouse, colors, game_state, targeting_item, key,
+                map_renderer, camera, profiler):
     """
-    Draw all tiles on the game (FOV) map and all entities in the list (con).
-    Render panel and targeting (cursor) consoles.
+    Draw all tiles on the game (FOV) map and all entities in the list in the
+    camera's view (con). Render panel and targeting (cursor) consoles.
     """
-    # === Game map ===
-    if fov_recompute:
-        for y in range(game_map.height):
-            for x in range(game_map.width):
-                # Checks if tiles are in FOV
-                visible = libtcod.map_is_in_fov(fov_map, x, y)
-                tile = game_map.tiles[x][y]
+    camera.follow(player.x, player.y, game_map.width, game_map.height)
 
-                if visible:
-                    tile_fg = libtcod.Color(*tile.colors_lit.get("fg"))
-                    tile_bg = libtcod.Color(*tile.colors_lit.get("bg"))
-                    libtcod.console_put_char_ex(con, x, y, tile.character, tile_fg, tile_bg)
+    entities_in_view = [entity for entity in entities if camera.in_view(entity.x, entity.y)]
 
-                    game_map.tiles[x][y].explored = True
+    # Restore the tiles that entities were erased from (see clear_all) and
+    # are not drawn on again, the others are drawn over below
+    drawn = {(entity.x, entity.y) for entity in entities_in_view if is_drawn(entity, fov_map, game_map)}
+    for x, y in map_renderer.entity_cells - drawn:
+        map_renderer.mark_dirty(x, y)
+    map_renderer.entity_cells = drawn
 
-                elif game_map.tiles[x][y].explored:
-                    tile_fg = libtcod.Color(*tile.colors_dark.get("fg"))
-                    tile_bg = libtcod.Color(*tile.colors_dark.get("bg"))
-                    libtcod.console_put_char_ex(con, x, y, tile.character, tile_fg, tile_bg)
+    # === Game map ===
+    with profiler.phase('map'):
+        map_renderer.render(game_map, fov_map, fov_recompute, player.x, player.y)
 
     # === Entities ===
-    entities_in_render_order = sorted(entities, key=lambda x: x.render_order.value)
+    with profiler.phase('ents'):
+        entities_in_render_order = sorted(entities_in_view, key=lambda x: x.render_order.value)
 
-    for entity in entities_in_render_order:
-        draw_entity(con, entity, fov_map, game_map)
+        for entity in entities_in_render_order:
+            draw_entity(con, entity, fov_map, game_map, camera)
 
-    # offset console by panel_width
-    libtcod.console_blit(con, 0, 0, screen_width, screen_height, 0, panel_width, 0)
+    with profiler.phase('panel'):
+        # The view is drawn next to the panel
+        libtcod.console_blit(con, 0, 0, camera.width, camera.height, 0, camera.screen_x, camera.screen_y)
 
-    libtcod.console_set_default_background(con, colors['background_default'])
+        libtcod.console_set_default_background(con, colors['background_default'])
 
 
-    # === Panel console ===
-    libtcod.console_set_default_background(panel, colors['background_panel'])
-    libtcod.console_clear(panel)
+        # === Panel console ===
+        libtcod.console_set_default_background(panel, colors['background_panel'])
+        libtcod.console_clear(panel)
 
-    # Print the message, one line at a time
-    y = 32
-    for message in message_log.messages:
-        # if y % 2 == 0 and message.color == libtcod.lightest_grey:
-        #     libtcod.console_set_default_foreground(panel, libtcod.grey)
-        # else:
-        libtcod.console_set_default_foreground(panel, message.color)
-        libtcod.console_print_ex(panel, message_log.x, y, libtcod.BKGND_NONE, libtcod.LEFT, message.text)
-        y += 1
+        # Print the message, one line at a time
+        y = 32
+        for message in message_log.messages:
+            # if y % 2 == 0 and message.color == libtcod.lightest_grey:
+            #     libtcod.console_set_default_foreground(panel, libtcod.grey)
+            # else:
+            libtcod.console_set_default_foreground(panel, message.color)
+            libtcod.console_print_ex(panel, message_log.x, y, libtcod.BKGND_NONE, libtcod.LEFT, message.text)
+            y += 1
 
-    render_info(panel, 1, 1, player.name.upper(), colors['text_info_alt'], None)
-    render_info(panel, 1, 2, 'Dungeon Level', colors['text_emphasize'], game_map.dungeon_level)
+        render_info(panel, 1, 1, player.name.upper(), colors['text_info_alt'], None)
+        render_info(panel, 1, 2, 'Dungeon Level', colors['text_emphasize'], game_map.dungeon_level)
 
-    render_bar(panel, 1, 4, bar_width, 'HP', player.fighter.hp, player.fighter.max_hp, colors['text_default'],
-                colors['render_bar_fg'], colors['render_bar_bg'])
-    render_bar(panel, 1, 5, bar_width, 'XP', player.level.current_xp, player.level.experience_to_next_level, colors['text_default'],
-                libtcod.orange, libtcod.dark_orange)
+        render_bar(panel, 1, 4, bar_width, 'HP', player.fighter.hp, player.fighter.max_hp, colors['text_default'],
+                    colors['render_bar_fg'], colors['render_bar_bg'])
+        render_bar(panel, 1, 5, bar_width, 'XP', player.level.current_xp, player.level.experience_to_next_level, colors['text_default'],
+                    libtcod.orange, libtcod.dark_orange)
 
-    render_info(panel, 1, 7, 'Attack', colors['text_default'], player.fighter.power, player.equipment.power_bonus)
-    render_info(panel, 1, 8, 'Defense', colors['text_default'], player.fighter.defense, player.equipment.defense_bonus)
+        render_info(panel, 1, 7, 'Attack', colors['text_default'], player.fighter.power, player.equipment.power_bonus)
+        render_info(panel, 1, 8, 'Defense', colors['text_default'], player.fighter.defense, player.equipment.defense_bonus)
 
-    libtcod.console_set_default_foreground(panel, colors['text_desaturate'])
-    libtcod.console_print_ex(panel, 1, 0, libtcod.BKGND_NONE, libtcod.LEFT,
-                                get_names_under_mouse(mouse, entities, fov_map))
-    description_box(con, get_entity_information_under_mouse(mouse, entities, fov_map),
-                        10, screen_width, screen_height, mouse.cx, mouse.cy, colors)
-
-    libtcod.console_blit(panel, 0, 0, panel_width, screen_height, 0, panel_x, 0)
-
-    if game_state in {GameStates.SHOW_INVENTORY, GameStates.SHOW_EQUIPMENT, GameStates.DROP_INVENTORY}:
-        if game_state == GameStates.SHOW_INVENTORY:
-            inventory_title = 'Press the key next to an item to use it, or Esc to cancel.\n'
-            inventory_menu(con, inventory_title, player, 30, screen_width, screen_height, colors)
-        elif game_state == GameStates.DROP_INVENTORY:
-            inventory_title = 'Press the key next to an item to drop it, or Esc to cancel.\n'
-            inventory_menu(con, inventory_title, player, 30, screen_width, screen_height, colors)
-        else:
-            inventory_title = 'Press the key next to an item to unequip it, or Esc to cancel.\n'
-            equipment_menu(con, inventory_title, player, 30, screen_width, screen_height, colors)
+        libtcod.console_set_default_foreground(panel, colors['text_desaturate'])
+        libtcod.console_print_ex(panel, 1, 0, libtcod.BKGND_NONE, libtcod.LEFT,
+                                    get_names_under_mouse(mouse, entities, fov_map, camera))
+        description_box(con, get_entity_information_under_mouse(mouse, entities, fov_map, camera),
+                            10, screen_width, screen_height, mouse.cx, mouse.cy, colors)
 
-    elif game_state == GameStates.LEVEL_UP:
-        level_up_menu(con, 'Level up! Choose at stat to raise:', player, 30, screen_width, screen_height, colors)
+        if profiler.show:
+            render_profiler(panel, 1, 10, profiler.stats(), colors)
 
-    elif game_state == GameStates.CHARACTER_SCREEN:
-        character_screen(player, 30, 10, screen_width, screen_height, colors)
+        libtcod.console_blit(panel, 0, 0, panel_width, screen_height, 0, panel_x, 0)
 
-    elif game_state == GameStates.TARGETING:
-        show_target(cursor, mouse, key, game_map.width, game_map.height, targeting_item)
+    # === Menus ===
+    with profiler.phase('menu'):
+        if game_state in {GameStates.SHOW_INVENTORY, GameStates.SHOW_EQUIPMENT, GameStates.DROP_INVENTORY}:
+            if game_state == GameStates.SHOW_INVENTORY:
+                inventory_title = 'Press the key next to an item to use it, or Esc to cancel.\n'
+                inventory_menu(con, inventory_title, player, 30, screen_width, screen_height, colors)
+            elif game_state == GameStates.DROP_INVENTORY:
+                inventory_title = 'Press the key next to an item to drop it, or Esc to cancel.\n'
+                inventory_menu(con, inventory_title, player, 30, screen_width, screen_height, colors)
+            else:
+                inventory_title = 'Press the key next to an item to unequip it, or Esc to cancel.\n'
+                equipment_menu(con, inventory_title, player, 30, screen_width, screen_height, colors)
 
+        elif game_state == GameStates.LEVEL_UP:
+            level_up_menu(con, 'Level up! Choose at stat to raise:', player, 30, screen_width, screen_height, colors)
 
-def clear_all(con, entities):
-    """Erase characters of all entities."""
+        elif game_state == GameStates.CHARACTER_SCREEN:
+            character_screen(player, 30, 10, screen_width, screen_height, colors)
+
+        elif game_state == GameStates.TARGETING:
+            show_target(cursor, mouse, key, camera, targeting_item)
+
+
+def clear_all(con, entities, fov_map, game_map, camera):
+    """Erase characters of all entities drawn in the camera's view."""
     for entity in entities:
-        clear_entity(con, entity)
+        if camera.in_view(entity.x, entity.y) and is_drawn(entity, fov_map, game_map):
+            clear_entity(con, entity, camera)
+
+
+def is_drawn(entity, fov_map, game_map):
+    """Return True if entity is drawn: it is in FOV, or explored stairs."""
+    return (libtcod.map_is_in_fov(fov_map, entity.x, entity.y)
+            or (entity.stairs and game_map.tiles.is_explored(entity.x, entity.y)))
 
 
-def draw_entity(con, entity, fov_map, game_map):
-    """Draw entity if it is in FOV."""
-    if libtcod.map_is_in_fov(fov_map, entity.x, entity.y) or (entity.stairs and game_map.tiles[entity.x][entity.y].explored):
+def draw_entity(con, entity, fov_map, game_map, camera):
+    """Draw entity if it is in FOV (it must be in the camera's view)."""
+    if is_drawn(entity, fov_map, game_map):
         libtcod.console_set_default_foreground(con, entity.color)
-        libtcod.console_put_char(con, entity.x, entity.y, entity.char, libtcod.BKGND_NONE)
+        libtcod.console_put_char(con, *camera.to_view(entity.x, entity.y), entity.char, libtcod.BKGND_NONE)
 
 
-def clear_entity(con, entity):
+def clear_entity(con, entity, camera):
     """Erase the character that represents this object (prevents leaving a trail)."""
-    libtcod.console_put_char(con, entity.x, entity.y, ' ', libtcod.BKGND_NONE)
+    libtcod.console_put_char(con, *camera.to_view(entity.x, entity.y), ' ', libtcod.BKGND_NONE)
@@ -0,0 +1,74 @@
+"""
+Replay a recorded game (engine.py --record) without a window, at full speed.
+
+Checks that every action leaves the rng in the recorded state and that the
+final game matches the recording, and reports the time taken, so the same
+whole-game workload can be timed across commits:
+
+    python replay.py game.rec --repeat 5
+"""
+import argparse
+import time
+import zlib
+
+from game_session import GameSession
+from loader_functions.autosave import rng_check
+from loader_functions.initialize_new_game import get_constants
+from loader_functions.recording import read_recording, save_session
+from loader_functions.save_format import load
+
+
+def replay(start, entries, constants):
+    """
+    Replay the entries of a recording on its start save.
+
+    Return the session and the index of the first entry whose outcome differs
+    from the recording (None if all match).
+    """
+    player, entities, game_map, message_log, game_state = load(start)
+    session = GameSession(player, entities, game_map, message_log, game_state, constants)
+
+    for index, (action, mouse_action, check) in enumerate(entries):
+        session.step(action, mouse_action)
+        if rng_check(session.game_map) != check:
+            session.close()
+            return session, index
+
+    session.close()
+    return session, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('recording')
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    constants = get_constants()
+    start, entries, final_crc = read_recording(args.recording)
+
+    times = []
+    for i in range(args.repeat):
+        began = time.perf_counter()
+        session, mismatch = replay(start, entries, constants)
+        times.append(time.perf_counter() - began)
+
+        if mismatch is not None:
+            raise SystemExit('action {0} of {1} did not replay like it was recorded'.format(mismatch, len(entries)))
+
+    if final_crc is None:
+        outcome = 'recording has no end (game crashed?)'
+    elif zlib.crc32(save_session(session)) == final_crc:
+        outcome = 'final game matches'
+    else:
+        raise SystemExit('final game differs from the recording')
+
+    best = min(times)
+    print('seed {0}: {1} actions, {2} turns, dungeon level {3}, {4}'.format(
+        session.game_map.seed, len(entries), session.turn, session.game_map.dungeon_level, outcome))
+    print('best of {0}: {1:.3f}s, {2:.1f} turns/s (mean {3:.3f}s)'.format(
+        args.repeat, best, session.turn / best, sum(times) / len(times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Soak test: let the autoplay bot play many seeded games in parallel.
+
+Every game runs in its own worker process (one game per process, so the
+peak memory of a game is its own). The report aggregates turns per second,
+dungeon generation time per generator (with the slowest floors, to find
+pathological seeds), death causes, exceptions and memory:
+
+    python soak.py --games 200 --turns 5000 --processes 8 --json soak.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter, defaultdict
+
+from autoplay import play
+from profiler import percentile
+
+
+def play_seed(arguments):
+    """Play one game in a worker process, return its report."""
+    seed, max_turns, max_floors = arguments
+    return play(seed, max_turns, max_floors)
+
+
+def summarize(reports, wall_time, slowest=5):
+    """Return aggregated statistics of the game reports."""
+    speeds = sorted(report['turns'] / report['elapsed'] for report in reports if report['elapsed'])
+    rss = [report['peak_rss'] for report in reports if report['peak_rss'] is not None]
+
+    generation = defaultdict(list)
+    floors = []
+    for report in reports:
+        for floor in report['floors']:
+            if floor['generation_time'] is not None:
+                generation[floor['generator']].append(floor['generation_time'])
+                floors.append((floor['generation_time'], floor['generator'], report['seed'], floor['level']))
+
+    deaths = Counter(report['killed_by'] or 'own spell' for report in reports if report['died'])
+
+    return {
+        'games': len(reports),
+        'wall_time': wall_time,
+        'turns': sum(report['turns'] for report in reports),
+        'floors': sum(len(report['floors']) for report in reports),
+        'turns_per_second': {
+            'p50': percentile(speeds, 0.5), 'min': speeds[0], 'max': speeds[-1]} if speeds else None,
+        'generation': {
+            name: {'floors': len(times), 'mean': sum(times) / len(times),
+                   'p95': percentile(sorted(times), 0.95), 'max': max(times)}
+            for name, times in sorted(generation.items())},
+        'slowest_floors': [{'time': elapsed, 'generator': generator, 'seed': seed, 'level': level}
+                           for elapsed, generator, seed, level in sorted(floors, reverse=True)[:slowest]],
+        'deaths': dict(deaths.most_common()),
+        'survived': sum(not report['died'] for report in reports),
+        'exceptions': [{'seed': report['seed'], 'exception': report['exception']}
+                       for report in reports if report['exception']],
+        'peak_rss': {'mean': sum(rss) / len(rss), 'max': max(rss)} if rss else None,
+    }
+
+
+def print_summary(summary):
+    print('{games} games, {turns} turns on {floors} floors in {wall_time:.1f}s ({0:.1f} turns/s overall)'.format(
+        summary['turns'] / summary['wall_time'], **summary))
+
+    speeds = summary['turns_per_second']
+    if speeds:
+        print('turns/s per game: p50 {p50:.1f}  min {min:.1f}  max {max:.1f}'.format(**speeds))
+
+    if summary['peak_rss']:
+        print('peak rss per game: mean {0:.1f} MiB  max {1:.1f} MiB'.format(
+            summary['peak_rss']['mean'] / 1024, summary['peak_rss']['max'] / 1024))
+
+    print()
+    print('{0:<14}{1:>7}{2:>10}{3:>10}{4:>10}'.format('generator', 'floors', 'mean ms', 'p95 ms', 'max ms'))
+    for name, stats in summary['generation'].items():
+        print('{0:<14}{1:>7}{2:>10.1f}{3:>10.1f}{4:>10.1f}'.format(
+            name, stats['floors'], stats['mean'] * 1000, stats['p95'] * 1000, stats['max'] * 1000))
+
+    print('slowest floors:')
+    for floor in summary['slowest_floors']:
+        print('  {0:8.1f} ms  {generator} (seed {seed}, level {level})'.format(floor['time'] * 1000, **floor))
+
+    print()
+    print('survived: {0}'.format(summary['survived']))
+    for cause, count in summary['deaths'].items():
+        print('killed by {0}: {1}'.format(cause, count))
+
+    if summary['exceptions']:
+        print()
+        print('{0} games raised an exception:'.format(len(summary['exceptions'])))
+        for failure in summary['exceptions']:
+            print('seed {0}: {1}'.format(failure['seed'], failure['exception'].strip().splitlines()[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=os.cpu_count())
+    parser.add_argument('--turns', type=int, default=5000, help='turns per game')
+    parser.add_argument('--floors', type=int, default=None, help='stop a game after clearing this many floors')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game (the others count up)')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--json', default=None, metavar='FILE', help='write summary and game reports to FILE')
+    args = parser.parse_args()
+
+    jobs = [(args.seed + i, args.turns, args.floors) for i in range(args.games)]
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.processes, maxtasksperchild=1) as pool:
+        reports = []
+        for report in pool.imap_unordered(play_seed, jobs):
+            reports.append(report)
+            print('\r{0}/{1} games'.format(len(reports), len(jobs)), end='', flush=True)
+    print()
+    wall_time = time.perf_counter() - start
+
+    reports.sort(key=lambda report: report['seed'])
+    summary = summarize(reports, wall_time)
+    print_summary(summary)
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump({'summary': summary, 'games': reports}, json_file, indent=2)
+
+    if summary['exceptions']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Energy based turn order.
+
+Every actor (player and monsters) gains its speed in energy per tick and
+may act once its energy is not negative; an action costs ACTION_COST energy,
+moving off a tile with a movement_mod costs that much more. Actors wait in a
+priority queue ordered by the tick at which they can act again, so only the
+actor whose turn it is gets woken.
+"""
+from heapq import heappop, heappush
+
+
+ACTION_COST = 100
+
+
+def move_cost(tiles, x, y):
+    """Return energy cost of stepping off the tile at (x, y)."""
+    movement_mod = tiles.movement_mod(x, y)
+    if movement_mod:
+        return ACTION_COST + int(ACTION_COST * movement_mod)
+    return ACTION_COST
+
+
+class TurnScheduler:
+    """Priority queue of actors ordered by the tick at which they can act."""
+
+    def __init__(self, next_rank=0):
+        self.time = 0
+        self._queue = []
+        # Actors that can act at the same tick act in the order of their
+        # rank, given when they are added for the first time. next_rank must
+        # be above the ranks of all actors (also the dormant ones).
+        self.next_rank = next_rank
+        # Current queue entry and the tick up to which energy was added, per actor
+        self._entries = {}
+        self._updated = {}
+
+    def __contains__(self, entity):
+        return entity in self._updated
+
+    def add(self, entity):
+        """Queue an actor, it acts as soon as its energy allows."""
+        if entity.fighter.rank is None:
+            entity.fighter.rank = self.next_rank
+            self.next_rank += 1
+        self._updated[entity] = self.time
+        self._push(entity)
+
+    def remove(self, entity):
+        """Take an actor out of the turn order."""
+        self._entries.pop(entity, None)
+        self._updated.pop(entity, None)
+
+    def next_actor(self):
+        """
+        Advance time to the next actor that can act and return it
+        (None if there are no actors). The actor is queued again by spend.
+        """
+        while self._queue:
+            entry = heappop(self._queue)
+            time, rank, entity = entry
+            if self._entries.get(entity) is not entry:
+                # Removed or queued again since
+                continue
+
+            del self._entries[entity]
+            self.time = time
+            self._add_energy(entity)
+            return entity
+
+        return None
+
+    def spend(self, entity, cost=ACTION_COST):
+        """Subtract the cost of an action from the actor's energy and queue it again."""
+        entity.fighter.energy -= cost
+        self._push(entity)
+
+    def settle(self):
+        """Add the energy gained up to now to all actors (before saving the game)."""
+        for entity in self._updated:
+            self._add_energy(entity)
+
+    def _add_energy(self, entity):
+        entity.fighter.energy += (self.time - self._updated[entity]) * entity.fighter.speed
+        self._updated[entity] = self.time
+
+    def _push(self, entity):
+        fighter = entity.fighter
+        # Ticks until energy is not negative
+        wait = max(0, -(fighter.energy // fighter.speed))
+        entry = (self.time + wait, fighter.rank, entity)
+        self._entries[entity] = entry
+        heappush(self._queue, entry)